@@ -0,0 +1,160 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Metadata for release branches"""
+
+import datetime
+
+# Early 4.7 releases did not support PHP 7.2
+EARLY_47 = {
+    'description': (
+        'Older version compatible with PHP 5.5 to 7.1 and MySQL 5.5 and newer. '
+    ),
+}
+
+# Branch metadata indexed by branch, major version is used for old releases
+#
+# php, mysql: supported versions as Composer constraints
+# description: compatibility text shown with the release
+# support: support status text shown after the description
+# eol: end of support date
+# releases: overrides for individual releases
+BRANCHES = {
+    '5.1': {
+        'php': '>=7.1,<8.0',
+        'mysql': '>=5.5',
+        'description': (
+            'Future version compatible with PHP 7.1 and newer and MySQL 5.5 and newer. '
+        ),
+    },
+    '5.0': {
+        'php': '>=7.1,<8.0',
+        'mysql': '>=5.5',
+        'description': (
+            'Current version compatible with PHP 7.1 and newer and MySQL 5.5 and newer. '
+        ),
+    },
+    '4.9': {
+        'php': '>=5.5,<8.0',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.5 to 7.4 and MySQL 5.5 and newer. '
+        ),
+        'support': 'Currently supported for security fixes only. ',
+    },
+    '4.8': {
+        'php': '>=5.5,<7.3',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.5 to 7.2 and MySQL 5.5 and newer. '
+        ),
+        'support': 'Was supported until June 4, 2019.',
+        'eol': datetime.date(2019, 6, 4),
+    },
+    '4.7': {
+        'php': '>=5.5,<7.3',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.5 to 7.2 and MySQL 5.5 and newer. '
+        ),
+        'support': 'Was supported until April 7, 2018.',
+        'eol': datetime.date(2018, 4, 7),
+        'releases': dict.fromkeys(
+            ('4.7.0', '4.7.1', '4.7.2', '4.7.3', '4.7.0-rc1', '4.7.0-beta1'),
+            EARLY_47
+        ),
+    },
+    '4.6': {
+        'php': '>=5.5,<7.2',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.5 to 7.1 and MySQL 5.5 and newer. '
+        ),
+        'support': 'Was supported until April 1, 2017.',
+        'eol': datetime.date(2017, 4, 1),
+    },
+    '4.5': {
+        'php': '>=5.5,<7.1',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.5 to 7.0 and MySQL 5.5. '
+        ),
+        'support': 'Was supported until April 1, 2016.',
+        'eol': datetime.date(2016, 4, 1),
+    },
+    '4.4': {
+        'php': '>=5.3,<7.1',
+        'mysql': '>=5.5',
+        'description': (
+            'Older version compatible with PHP 5.3.7 to 7.0 and MySQL 5.5. '
+        ),
+        'support': 'Was supported until October 1, 2016.',
+        'eol': datetime.date(2016, 10, 1),
+    },
+    '4.3': {
+        'php': '>=5.3,<7.0',
+        'mysql': '>=5.5',
+        'description': 'Older version compatible with PHP 5.3 and MySQL 5.5. ',
+        'support': 'Was supported until October 1, 2015.',
+        'eol': datetime.date(2015, 10, 1),
+    },
+    '4.2': {
+        'php': '>=5.3,<7.0',
+        'mysql': '>=5.5',
+        'description': 'Older version compatible with PHP 5.3 and MySQL 5.5. ',
+        'support': 'Was supported until July 1, 2015.',
+        'eol': datetime.date(2015, 7, 1),
+    },
+    '4.1': {
+        'php': '>=5.3,<7.0',
+        'mysql': '>=5.5',
+        'description': 'Older version compatible with PHP 5.3 and MySQL 5.5. ',
+        'support': 'Was supported until January 1, 2015.',
+        'eol': datetime.date(2015, 1, 1),
+    },
+    '4.0': {
+        'php': '>=5.2,<5.3',
+        'mysql': '>=5.0',
+        'description': (
+            'Older version compatible with PHP 5.2 and MySQL 5. ' +
+            'Does not support PHP 5.5 or newer. '
+        ),
+        'support': 'Was supported until April 1, 2017.',
+        'eol': datetime.date(2017, 4, 1),
+    },
+    '3': {
+        'description': (
+            'Frames version not requiring Javascript. ' +
+            'Requires PHP 5.2 and MySQL 5. '
+        ),
+        'support': 'Supported for security fixes only, until Jan 1, 2014.',
+        'eol': datetime.date(2014, 1, 1),
+    },
+    '2': {
+        'description': 'Version compatible with PHP 4+ and MySQL 3+.',
+    },
+    '1': {
+        'description': 'Historical release.',
+    },
+    '0': {
+        'description': 'Historical release.',
+    },
+}
@@ -21,7 +21,7 @@
 
 from collections import OrderedDict
 from ConfigParser import RawConfigParser
-import urllib
+from StringIO import StringIO
 
 from django.core.management.base import BaseCommand
 from django.core.urlresolvers import reverse
@@ -29,6 +29,8 @@ from django.core.urlresolvers import reverse
 from demo.models import Demo
 
 from pmaweb.cdn import purge_cdn
+from pmaweb.httpclient import get
+from pmaweb.renderqueue import enqueue_render
 
 URL = 'https://demo.phpmyadmin.net/versions.ini'
 
@@ -46,10 +48,9 @@ class Command(BaseCommand):
     help = 'Downloads demo server versions'
 
     def handle(self, *args, **options):
-        handle = urllib.urlopen(URL)
         config = RawConfigParser(dict_type=MultiOrderedDict)
         try:
-          config.readfp(handle)
+          config.readfp(StringIO(get(URL).content))
         except:
           print("Failed to read the version configuration file. ")
           print("Check the status of " + URL)
@@ -79,3 +80,4 @@ class Command(BaseCommand):
 
         if modified:
             purge_cdn(reverse('try'))
+            enqueue_render(reverse('try'))
@@ -19,8 +19,11 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 from django.db import models
 import re
+from pmaweb.snapshot import invalidate
 
 
 QA_RE = re.compile(r'QA_([0-9]*)_([0-9]*)')
@@ -72,3 +75,9 @@ class Demo(models.Model):
             )
 
         return 'VERSION: {0}'.format(self.name)
+
+
+@receiver(post_save, sender=Demo)
+@receiver(post_delete, sender=Demo)
+def update_demo(sender, instance, **kwargs):
+    invalidate()
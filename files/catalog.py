@@ -0,0 +1,276 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""In-process index of releases and their downloads"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.db.models import Case, F, TextField, Value, When
+
+from files.models import DownloadMixin, Release, ReleaseMixin
+from files.versions import Version
+from pmaweb.snapshot import Snapshot, RELEASES_GENERATION
+
+# Releases from one branch share version_num divided by this
+BRANCH_DELTA = 1000000
+
+# Number of releases on one page of the files archive
+ARCHIVE_PAGE_SIZE = 50
+
+
+def get_branch_key(version):
+    """Returns key of the branch bucket, eg. 4.9 for 4.9.5"""
+    return Version(version).num // BRANCH_DELTA
+
+
+def get_branch_range(branch):
+    """Returns range of version_num for releases in branch"""
+    min_vernum = get_branch_key(branch) * BRANCH_DELTA
+    return min_vernum, min_vernum + BRANCH_DELTA
+
+
+def get_archive_url(branch=None, before=None):
+    """Returns URL of files archive page
+
+    The page lists releases with version_num lower than before.
+    """
+    if branch is None:
+        if before is None:
+            return reverse('files')
+        return reverse('files-page', kwargs={'before': before})
+    if before is None:
+        return reverse('files-branch', kwargs={'branch': branch})
+    return reverse(
+        'files-branch-page', kwargs={'branch': branch, 'before': before}
+    )
+
+
+class CatalogDownload(DownloadMixin):
+    __slots__ = ('release', 'filename', 'size', 'sha1', 'sha256', 'signed')
+
+    def __init__(self, release, filename, size, sha1, sha256, signed):
+        self.release = release
+        self.filename = filename
+        self.size = size
+        self.sha1 = sha1
+        self.sha256 = sha256
+        self.signed = signed
+
+    def __str__(self):
+        return str(self.__unicode__())
+
+    def __repr__(self):
+        return '<CatalogDownload: {0}>'.format(self)
+
+
+class CatalogRelease(ReleaseMixin):
+    __slots__ = (
+        'pk', 'version', 'version_num', 'stable', 'snapshot', 'date',
+        'snapshot_commit', 'downloads', 'featured_downloads',
+    )
+
+    def __init__(self, pk, version, version_num, stable, snapshot, date,
+                 snapshot_commit):
+        self.pk = pk
+        self.version = version
+        self.version_num = version_num
+        self.stable = stable
+        self.snapshot = snapshot
+        self.date = date
+        self.snapshot_commit = snapshot_commit
+        self.downloads = ()
+        self.featured_downloads = ()
+
+    def __str__(self):
+        return str(self.version)
+
+    def __repr__(self):
+        return '<CatalogRelease: {0}>'.format(self)
+
+    def set_downloads(self, downloads):
+        """Attaches downloads, these are expected ordered by filename"""
+        self.downloads = tuple(downloads)
+        self.featured_downloads = tuple(
+            [item for item in self.downloads if item.is_featured] +
+            [item for item in self.downloads if not item.is_featured]
+        )
+
+    def simpledownload(self):
+        for download in self.downloads:
+            if download.filename.endswith('-all-languages.zip'):
+                return download
+        if self.downloads:
+            return self.downloads[0]
+        return None
+
+    def get_downloads(self):
+        """Lists downloads, making all-languages.zip first"""
+        return self.featured_downloads
+
+    def list_downloads(self):
+        return self.downloads
+
+    def get_download(self, suffix):
+        """Returns download with filename ending with suffix or None"""
+        for download in self.downloads:
+            if download.filename.endswith(suffix):
+                return download
+        return None
+
+
+class ReleaseCatalog(object):
+    """Immutable index of all releases
+
+    The catalog is loaded by single query and replaced as a whole once
+    releases or downloads change, so it never has to be locked for reading.
+    """
+    __slots__ = (
+        'releases', 'by_version', 'branches', 'branch_latest', 'latest',
+        'beta', 'listed', 'snapshots',
+    )
+
+    def __init__(self, releases):
+        # Descending order, same as the Release model
+        self.releases = tuple(
+            sorted(releases, key=attrgetter('version_num'), reverse=True)
+        )
+        self.by_version = {
+            release.version: release for release in self.releases
+        }
+        branches = {}
+        branch_latest = {}
+        for release in self.releases:
+            key = release.version_num // BRANCH_DELTA
+            branches.setdefault(key, []).append(release)
+            if release.stable and key not in branch_latest:
+                branch_latest[key] = release
+        self.branches = {
+            key: tuple(value) for key, value in branches.items()
+        }
+        self.branch_latest = branch_latest
+
+        self.listed = tuple(
+            release for release in self.releases if not release.snapshot
+        )
+        self.snapshots = tuple(
+            release for release in self.releases if release.snapshot
+        )
+        self.latest = next(
+            (release for release in self.releases if release.stable), None
+        )
+        self.beta = next(
+            (release for release in self.listed if not release.stable), None
+        )
+        if (self.beta is not None and self.latest is not None and
+                self.beta.version_num < self.latest.version_num):
+            self.beta = None
+
+    @classmethod
+    def load(cls):
+        """Loads releases with downloads from the database"""
+        rows = Release.objects.annotate(
+            # Release notes of snapshots contain only the Git commit
+            commit=Case(
+                When(snapshot=True, then=F('release_notes')),
+                default=Value(''),
+                output_field=TextField(),
+            )
+        ).order_by(
+            '-version_num', 'download__filename'
+        ).values_list(
+            'pk', 'version', 'version_num', 'stable', 'snapshot', 'date',
+            'commit', 'download__filename', 'download__size',
+            'download__sha1', 'download__sha256', 'download__signed',
+        )
+        releases = []
+        downloads = []
+        for row in rows:
+            if not releases or releases[-1].pk != row[0]:
+                if releases:
+                    releases[-1].set_downloads(downloads)
+                releases.append(CatalogRelease(*row[:7]))
+                downloads = []
+            if row[7] is not None:
+                downloads.append(CatalogDownload(releases[-1], *row[7:]))
+        if releases:
+            releases[-1].set_downloads(downloads)
+        return cls(releases)
+
+    def get(self, version):
+        return self.by_version.get(version)
+
+    def get_branch(self, branch):
+        """Returns releases in branch, newest first"""
+        return self.branches.get(get_branch_key(branch), ())
+
+    def get_branch_latest(self, branch):
+        """Returns latest stable release in branch or None"""
+        return self.branch_latest.get(get_branch_key(branch))
+
+    def get_branch_names(self):
+        """Returns branches with releases, newest first"""
+        return [
+            '{0}.{1}'.format(key // 100, key % 100)
+            for key in sorted(self.branches, reverse=True)
+            if any(not release.snapshot for release in self.branches[key])
+        ]
+
+    def get_archive_urls(self, branch=None, exclude=None):
+        """Returns URLs of all files archive pages
+
+        The optional exclude is version_num of release to leave out, this
+        gives pages as they were before the release was added.
+        """
+        if branch is None:
+            releases = self.listed
+        else:
+            releases = self.get_branch(branch)
+        releases = [
+            release for release in releases
+            if not release.snapshot and release.version_num != exclude
+        ]
+        result = [get_archive_url(branch)]
+        for end in range(ARCHIVE_PAGE_SIZE, len(releases), ARCHIVE_PAGE_SIZE):
+            result.append(
+                get_archive_url(branch, releases[end - 1].version_num)
+            )
+        return result
+
+    def get_current_releases(self):
+        """Returns latest stable releases of listed branches"""
+        result = []
+        for branch in settings.LISTED_BRANCHES:
+            release = self.get_branch_latest(branch)
+            if release is not None:
+                result.append(release)
+        return result
+
+
+CATALOG = Snapshot(
+    {'catalog': ReleaseCatalog.load},
+    key=RELEASES_GENERATION,
+)
+
+
+def get_catalog():
+    """Returns current catalog, loading it after releases change"""
+    return CATALOG.get('catalog')
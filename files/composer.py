@@ -0,0 +1,190 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Composer repository metadata
+
+The repository uses the Composer 2 layout: ``packages.json`` points to
+per package files in ``p2/``, stable versions are listed in
+``p2/phpmyadmin/phpmyadmin.json`` and development ones in
+``p2/phpmyadmin/phpmyadmin~dev.json``. Composer fetches these lazily and
+only for packages it resolves.
+
+Composer 1 does not know the metadata URL, so ``packages.json`` still
+includes all versions for it.
+"""
+import hashlib
+import json
+
+from files.catalog import get_catalog
+from pmaweb.snapshot import Snapshot, RELEASES_GENERATION
+
+PACKAGE = 'phpmyadmin/phpmyadmin'
+
+METADATA_URL = '/p2/%package%.json'
+
+# Paths of the generated files
+METADATA_PATH = 'p2/{0}.json'.format(PACKAGE)
+DEV_METADATA_PATH = 'p2/{0}~dev.json'.format(PACKAGE)
+
+# Format of minified version lists
+MINIFIED = 'composer/2.0'
+
+DEV_VERSIONS = [
+    {
+        'name': PACKAGE,
+        'version': 'dev-master',
+        'dist': {
+            'url': (
+                'https://github.com/phpmyadmin/phpmyadmin/archive/master.zip'
+            ),
+            'type': 'zip',
+        },
+    },
+]
+
+# Version entries of already processed releases, keyed by version
+ENTRIES = {}
+
+
+def serialize(data):
+    """Serializes data in compact and stable form"""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+def get_content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def normalize_version(version):
+    """Returns version normalized the same way as Composer does"""
+    base, _, suffix = version.partition('-')
+    parts = base.split('.')
+    parts.extend(['0'] * (4 - len(parts)))
+    result = '.'.join(parts)
+    if suffix:
+        if suffix.startswith('rc'):
+            suffix = 'RC' + suffix[2:]
+        result = '{0}-{1}'.format(result, suffix)
+    return result
+
+
+def get_version_entry(release):
+    """Returns Composer version entry for a release
+
+    Entries are reused until release date or its download change, so adding
+    a release only builds the entry for it.
+    """
+    download = release.simpledownload()
+    if download is None:
+        return None
+    key = (release.date, download.filename, download.sha1)
+    cached = ENTRIES.get(release.version)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    entry = {
+        'name': PACKAGE,
+        'version': release.version,
+        'version_normalized': normalize_version(release.version),
+        'time': release.date.isoformat(),
+        'dist': {
+            'url': download.get_absolute_url(),
+            'type': download.composer_type,
+            'shasum': download.sha1,
+        },
+    }
+    ENTRIES[release.version] = (key, entry)
+    return entry
+
+
+def minify(versions):
+    """Minifies version list
+
+    Every version only lists keys which differ from the previous one, keys
+    which are no longer present are marked as unset.
+    """
+    result = []
+    previous = None
+    for version in versions:
+        if previous is None:
+            result.append(version)
+        else:
+            entry = {
+                key: value
+                for key, value in version.items()
+                if key not in previous or previous[key] != value
+            }
+            for key in previous:
+                if key not in version:
+                    entry[key] = '__unset'
+            result.append(entry)
+        previous = version
+    return result
+
+
+def get_metadata(versions):
+    return serialize({
+        'minified': MINIFIED,
+        'packages': {PACKAGE: minify(versions)},
+    })
+
+
+def get_stable_versions():
+    versions = []
+    for release in get_catalog().listed:
+        entry = get_version_entry(release)
+        if entry is not None:
+            versions.append(entry)
+    return versions
+
+
+def get_packages():
+    versions = METADATA.get('versions') + DEV_VERSIONS
+    return serialize({
+        # Composer 1 layout
+        'packages': {
+            PACKAGE: {version['version']: version for version in versions},
+        },
+        'metadata-url': METADATA_URL,
+        'available-packages': [PACKAGE],
+    })
+
+
+METADATA = Snapshot(
+    {
+        'versions': get_stable_versions,
+        'packages': get_packages,
+        'stable': lambda: get_metadata(METADATA.get('versions')),
+        'dev': lambda: get_metadata(DEV_VERSIONS),
+    },
+    key=RELEASES_GENERATION,
+)
+
+
+def get_packages_json():
+    return METADATA.get('packages')
+
+
+def get_metadata_json():
+    return METADATA.get('stable')
+
+
+def get_dev_metadata_json():
+    return METADATA.get('dev')
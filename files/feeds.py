@@ -21,6 +21,7 @@
 
 from django.contrib.syndication.views import Feed
 from files.models import Release
+from pmaweb.dependencies import record, ALL
 
 
 class ReleaseFeed(Feed):
@@ -29,6 +30,7 @@ class ReleaseFeed(Feed):
     description = "Releases from the phpMyAdmin project."
 
     def items(self):
+        record(ALL)
         return Release.objects.order_by('-date')[:10]
 
     def item_title(self, item):
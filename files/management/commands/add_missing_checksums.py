@@ -19,30 +19,77 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+from functools import partial
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.db.models import Q
-from hashlib import sha256, sha1
-from files.models import Download, Theme
+from files.models import Download, Theme, coalesce_purges, purge_theme
+from files.utils import ALGORITHMS, process_pool, read_sums
 
 
 class Command(BaseCommand):
     help = 'Calculates missing checksums for releases'
 
-    def add_sums(self, item):
-        with open(item.get_filesystem_path(), 'r') as handle:
-            data = handle.read()
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Number of processes computing checksums',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=100,
+            help='Number of items stored in single transaction',
+        )
+        parser.add_argument(
+            '--write-sums',
+            action='store_true',
+            help='Write missing .sha1 and .sha256 files next to the files',
+        )
 
-        if item.sha256 == '':
-            item.sha256 = sha256(data).hexdigest()
+    def get_items(self):
+        query = Q(sha256='') | Q(sha1='')
+        return list(Theme.objects.filter(query)) + list(
+            Download.objects.filter(query).select_related('release')
+        )
 
-        if item.sha1 == '':
-            item.sha1 = sha1(data).hexdigest()
+    def save_batch(self, batch):
+        """Stores checksums of the batch and purges affected pages once
 
-        item.save()
+        Pages are purged after the transaction is committed.
+        """
+        themes = []
+        with transaction.atomic(), coalesce_purges() as releases:
+            for item, sums in batch:
+                values = {
+                    algorithm: sums[algorithm]
+                    for algorithm in ALGORITHMS
+                    if getattr(item, algorithm) == ''
+                }
+                type(item).objects.filter(pk=item.pk).update(**values)
+                if isinstance(item, Download):
+                    releases[item.release.version] = item.release
+                else:
+                    themes.append(item)
+            if themes:
+                transaction.on_commit(partial(purge_theme, Theme, themes[0]))
 
     def handle(self, *args, **options):
-        query = Q(sha256='') | Q(sha1='')
-        for item in Theme.objects.filter(query):
-            self.add_sums(item)
-        for item in Download.objects.filter(query):
-            self.add_sums(item)
+        items = self.get_items()
+        paths = [item.get_filesystem_path() for item in items]
+        function = partial(read_sums, write=options['write_sums'])
+        with process_pool(options['jobs']) as imap:
+            results = imap(function, paths)
+            batch = []
+            for item in items:
+                batch.append((item, next(results)))
+                if len(batch) >= options['batch']:
+                    self.save_batch(batch)
+                    batch = []
+            if batch:
+                self.save_batch(batch)
+        self.stdout.write('Added checksums for {0} files'.format(len(items)))
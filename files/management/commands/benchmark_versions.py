@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from files import versions
+from files.versions import parse_versions, sort_versions
+
+
+def generate_versions(count, seed):
+    """Generates synthetic version strings, many of them repeated"""
+    generator = random.Random(seed)
+    suffixes = ['', '', '', '-alpha1', '-beta2', '-rc1', '+snapshot']
+    result = []
+    for dummy in range(count):
+        suffix = generator.choice(suffixes)
+        if suffix == '+snapshot':
+            result.append('{0}.{1}+snapshot'.format(
+                generator.randint(2, 6), generator.randint(0, 9)
+            ))
+            continue
+        result.append('{0}.{1}.{2}{3}'.format(
+            generator.randint(2, 6),
+            generator.randint(0, 9),
+            generator.randint(0, 20),
+            suffix,
+        ))
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Measures parsing and sorting of version strings'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=1000000,
+            help='Number of versions to process',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Seed for generating versions',
+        )
+
+    def measure(self, name, function, *args):
+        start = time.time()
+        result = function(*args)
+        self.stdout.write('{0}: {1:.3f} s'.format(name, time.time() - start))
+        return result
+
+    def handle(self, *args, **options):
+        data = generate_versions(options['count'], options['seed'])
+        self.stdout.write('Versions: {0}, distinct: {1}'.format(
+            len(data), len(set(data))
+        ))
+        versions.CACHE.clear()
+        self.measure('Parse (cold cache)', parse_versions, data)
+        self.measure('Parse (warm cache)', parse_versions, data)
+        self.measure('Parse and sort', sort_versions, data)
@@ -21,7 +21,7 @@
 
 from django.core.management.base import BaseCommand
 
-from files.models import dockerhub_trigger
+from pmaweb.dockerhub import dockerhub_trigger
 
 
 class Command(BaseCommand):
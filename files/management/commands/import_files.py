@@ -19,133 +19,380 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import transaction
 from dateutil import parser
+from collections import OrderedDict
+from contextlib import contextmanager
 import json
 import os
-from glob import glob
-from files.models import Release, Download
+import time
+from files.manifest import Manifest, ManifestLocked, get_names, get_signature
+from files.models import Release, Download, coalesce_purges
 from bs4 import BeautifulSoup
-from files.utils import read_sum
+from files.utils import (
+    SIDECAR_SUFFIXES, list_downloads, process_pool, read_sums,
+)
+from files.versions import sort_versions
 import codecs
 from pmaweb.cdn import purge_files_cdn
 
+# Fields of downloads read from the filesystem
+DOWNLOAD_FIELDS = ('size', 'sha1', 'sha256', 'signed')
 
-def glob_downloads(prefix=''):
-    return (
-        glob(prefix + '*.zip') +
-        glob(prefix + '*.7z') +
-        glob(prefix + '*.tar.gz') +
-        glob(prefix + '*.tar.bz2') +
-        glob(prefix + '*.tar.xz')
+# Number of downloads inserted by single query
+BATCH_SIZE = 100
+
+# Phases of the import reported in timings
+PHASES = ('scan', 'read', 'write')
+
+
+def is_changed(filename, previous, signature):
+    """Checks whether download or its sidecar files have changed"""
+    return any(
+        previous.get(name) != signature.get(name)
+        for name in [filename] + [filename + suffix
+                                  for suffix in SIDECAR_SUFFIXES]
     )
 
 
+def read_values(path, filename):
+    fullname = os.path.join(path, filename)
+    sums = read_sums(fullname)
+    return {
+        'size': os.path.getsize(fullname),
+        'sha1': sums['sha1'],
+        'sha256': sums['sha256'],
+        'signed': os.path.exists('{0}.asc'.format(fullname)),
+    }
+
+
+def read_notes(filename):
+    with codecs.open(filename, 'r', 'utf-8') as handle:
+        return BeautifulSoup(handle.read(), 'lxml').get_text()
+
+
+def read_version(task):
+    """Reads files of single version, runs in the worker processes
+
+    The task lists directory, downloads to read and optionally release
+    notes and snapshot metadata files.
+    """
+    result = {
+        'files': [
+            (filename, read_values(task['path'], filename))
+            for filename in task['filenames']
+        ],
+        'notes': None,
+        'metadata': None,
+    }
+    if task.get('notes'):
+        result['notes'] = read_notes(task['notes'])
+    if task.get('metadata'):
+        with open(task['metadata'], 'r') as handle:
+            result['metadata'] = json.load(handle)
+    return result
+
+
 class Command(BaseCommand):
     help = 'Imports files from filesystem'
 
-    def process_files(self, path, release, prefix='', force=False):
-        os.chdir(path)
-        for filename in glob_downloads(prefix):
-            download, created = Download.objects.get_or_create(
-                release=release, filename=filename
-            )
-            if not created and not force:
-                continue
-            download.release = release
-            download.size = os.path.getsize(filename)
-            download.sha1 = read_sum('{0}.sha1'.format(filename))
-            download.sha256 = read_sum('{0}.sha256'.format(filename))
-            download.signed = os.path.exists('{0}.asc'.format(filename))
-            download.save()
-
-    def process_releases(self, path):
-        for version in os.listdir(path):
-            if version in ('README.rst', 'index.html'):
-                continue
-            release, created = Release.objects.get_or_create(version=version)
-            if created:
-                self.stdout.write('Added {0}'.format(version))
-                notes = '{0}/{1}/phpMyAdmin-{1}-notes.html'.format(
-                    path, version
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Number of processes reading the files',
+        )
+        parser.add_argument(
+            '--release',
+            action='append',
+            dest='versions',
+            help='Import only given release, can be used multiple times',
+        )
+        parser.add_argument(
+            '--snapshots-only',
+            action='store_true',
+            help='Import only snapshots',
+        )
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.time() - start
+
+    def read(self, tasks):
+        """Reads versions from the filesystem using the process pool"""
+        with self.phase('read'):
+            results = list(self.imap(read_version, tasks))
+        self.files += sum(len(result['files']) for result in results)
+        return results
+
+    def add_downloads(self, release, files, existing):
+        """Collects new and changed downloads of the release"""
+        for filename, values in files:
+            download = existing.get(filename)
+            if download is None:
+                self.created.append(
+                    Download(release=release, filename=filename, **values)
                 )
-                if os.path.exists(notes):
-                    with codecs.open(notes, 'r', 'utf-8') as handle:
-                        release.release_notes_markup_type = 'html'
-                        release.release_notes = u'<pre>{0}</pre>'.format(
-                            BeautifulSoup(
-                                handle.read(),
-                                'lxml',
-                            ).get_text()
+            elif any(getattr(download, name) != values[name]
+                     for name in DOWNLOAD_FIELDS):
+                for name in DOWNLOAD_FIELDS:
+                    setattr(download, name, values[name])
+                self.updated.append(download)
+            else:
+                continue
+            self.releases[release.version] = release
+
+    def save_downloads(self):
+        Download.objects.bulk_create(self.created, batch_size=BATCH_SIZE)
+        for download in self.updated:
+            download.save(update_fields=DOWNLOAD_FIELDS)
+
+    def process_releases(self, path, manifest, versions=None):
+        """Imports releases
+
+        Existing downloads are read again when their files changed since
+        the previous import, or always when importing given versions or
+        when there is no previous signature.
+        """
+        with self.phase('scan'):
+            if versions is None:
+                names = [
+                    name for name in os.listdir(path)
+                    if name not in ('README.rst', 'index.html')
+                ]
+            else:
+                names = versions
+                for version in versions:
+                    if not os.path.isdir(os.path.join(path, version)):
+                        raise CommandError(
+                            'Release not found: {0}'.format(version)
                         )
-                        release.save()
-            self.process_files(
-                os.path.join(path, version),
-                release
+            changed = []
+            for version in [item.version for item in sort_versions(names)]:
+                directory = os.path.join(path, version)
+                signature = get_signature(directory)
+                if not manifest.is_current(directory, signature):
+                    changed.append((
+                        version, directory, signature,
+                        manifest.get(directory),
+                    ))
+        if not changed:
+            return
+
+        with self.phase('write'):
+            releases = {
+                release.version: release
+                for release in Release.objects.filter(
+                    version__in=[item[0] for item in changed]
+                )
+            }
+            versions_by_id = {
+                release.pk: version for version, release in releases.items()
+            }
+            existing = {}
+            downloads = Download.objects.filter(
+                release__in=releases.values()
             )
+            for download in downloads:
+                files = existing.setdefault(
+                    versions_by_id[download.release_id], {}
+                )
+                files[download.filename] = download
 
-    def process_snapshots(self, path):
-        os.chdir(path)
+        tasks = []
+        for version, directory, signature, previous in changed:
+            names = get_names(signature)
+            notes = 'phpMyAdmin-{0}-notes.html'.format(version)
+            downloads = existing.get(version, {})
+            tasks.append({
+                'path': directory,
+                'filenames': [
+                    name for name in list_downloads(names)
+                    if versions is not None or name not in downloads or
+                    is_changed(name, previous or {}, signature)
+                ],
+                'notes': (
+                    os.path.join(directory, notes)
+                    if version not in releases and notes in names else None
+                ),
+            })
+        results = self.read(tasks)
 
-        # List current versions
-        versions = set([x.rsplit('.', 1)[0].split('-')[1] for x in glob('*+snapshot.json')])
+        with self.phase('write'):
+            for item, result in zip(changed, results):
+                version, directory, signature, previous = item
+                release = releases.get(version)
+                if release is None:
+                    release = Release(version=version)
+                    if result['notes'] is not None:
+                        release.release_notes_markup_type = 'html'
+                        release.release_notes = u'<pre>{0}</pre>'.format(
+                            result['notes']
+                        )
+                    release.save()
+                    self.stdout.write('Added {0}'.format(version))
+                self.add_downloads(
+                    release, result['files'], existing.get(version, {})
+                )
+                manifest.update(directory, signature)
 
-        # Delete no longer present snapshots
-        Release.objects.filter(snapshot=True).exclude(version__in=versions).delete()
+    def process_snapshots(self, path, manifest):
+        with self.phase('scan'):
+            signature = get_signature(path)
+            if manifest.is_current(path, signature):
+                return
+            names = get_names(signature)
 
-        purge = []
+            # List current versions
+            versions = [
+                item.version for item in sort_versions(set([
+                    x.rsplit('.', 1)[0].split('-')[1]
+                    for x in names if x.endswith('+snapshot.json')
+                ]))
+            ]
 
-        # Process versions
-        for version in versions:
-            metafile = os.path.join(
-                path,
-                'phpMyAdmin-' + version + '.json'
-            )
-            with open(metafile, 'r') as handle:
-                metadata = json.load(handle)
-            defaults = {
-                'snapshot': True,
-                'release_notes': metadata['commit'],
-                'release_notes_markup_type': 'plain',
-                'date': parser.parse(metadata['date']),
+        with self.phase('write'):
+            # Delete no longer present snapshots
+            Release.objects.filter(snapshot=True).exclude(
+                version__in=versions
+            ).delete()
+            releases = {
+                release.version: release
+                for release in Release.objects.filter(version__in=versions)
             }
-            release, created = Release.objects.get_or_create(
-                version=version,
-                defaults=defaults,
-            )
-            if created:
-                self.stdout.write('Added {0}'.format(version))
-            else:
-                modified = False
-                for item in defaults:
-                    if item == 'release_notes':
-                        current = release.release_notes.raw
-                    else:
-                        current = getattr(release, item)
-                    if current != defaults[item]:
-                        setattr(release, item, defaults[item])
-                        modified = True
-                if modified:
-                    self.stdout.write('Updated {0}'.format(version))
-                    release.save()
-            self.process_files(
-                path,
-                release,
-                prefix='phpMyAdmin-' + version,
-                force=True,
+            existing = {}
+            downloads = Download.objects.filter(
+                release__in=releases.values()
             )
+            for download in downloads:
+                files = existing.setdefault(download.release_id, {})
+                files[download.filename] = download
+
+        results = self.read([
+            {
+                'path': path,
+                'filenames': list_downloads(
+                    names, 'phpMyAdmin-' + version
+                ),
+                'metadata': os.path.join(
+                    path, 'phpMyAdmin-' + version + '.json'
+                ),
+            }
+            for version in versions
+        ])
+
+        with self.phase('write'):
+            purge = []
+            for version, result in zip(versions, results):
+                self.process_snapshot(
+                    version, result, releases.get(version), existing, purge
+                )
+            if purge:
+                purge_files_cdn(*purge)
+        manifest.update(path, signature)
+
+    def process_snapshot(self, version, result, release, existing, purge):
+        metadata = result['metadata']
+        defaults = {
+            'snapshot': True,
+            'release_notes': metadata['commit'],
+            'release_notes_markup_type': 'plain',
+            'date': parser.parse(metadata['date']),
+        }
+        modified = False
+        if release is None:
+            release = Release(version=version, **defaults)
+            release.save()
+            self.stdout.write('Added {0}'.format(version))
+        else:
+            for item in defaults:
+                if item == 'release_notes':
+                    current = release.release_notes.raw
+                else:
+                    current = getattr(release, item)
+                if current != defaults[item]:
+                    setattr(release, item, defaults[item])
+                    modified = True
             if modified:
-                for download in release.download_set.all():
-                    filename = download.__unicode__()
-                    purge.extend([
-                        filename,
-                        '{}.sha1'.format(filename),
-                        '{}.sha256'.format(filename),
-                    ])
-        if purge:
-            purge_files_cdn(*purge)
+                self.stdout.write('Updated {0}'.format(version))
+                release.save()
+        self.add_downloads(
+            release, result['files'], existing.get(release.pk, {})
+        )
+        if modified:
+            for download in release.download_set.all():
+                filename = download.__unicode__()
+                purge.extend([
+                    filename,
+                    '{}.sha1'.format(filename),
+                    '{}.sha256'.format(filename),
+                ])
+
+    def report(self, elapsed):
+        rate = self.files / elapsed if elapsed else 0
+        self.stdout.write(
+            'Processed {0} files in {1:.2f} s ({2:.1f} files/s)'.format(
+                self.files, elapsed, rate
+            )
+        )
+        self.stdout.write(', '.join(
+            '{0}: {1:.2f} s'.format(name, value)
+            for name, value in self.timings.items()
+        ))
+
+    def process(self, manifest, versions=None, snapshots_only=False):
+        """Imports releases and snapshots
+
+        Only releases with given versions or snapshots can be imported.
+        """
+        with transaction.atomic(), coalesce_purges() as releases:
+            self.releases = releases
+            if not snapshots_only:
+                self.process_releases(
+                    os.path.join(settings.FILES_PATH, 'phpMyAdmin'),
+                    manifest,
+                    versions,
+                )
+            if not versions:
+                self.process_snapshots(
+                    os.path.join(settings.FILES_PATH, 'snapshots'),
+                    manifest
+                )
+            with self.phase('write'):
+                self.save_downloads()
 
     def handle(self, *args, **options):
-        self.process_releases(os.path.join(settings.FILES_PATH, 'phpMyAdmin'))
-        self.process_snapshots(os.path.join(settings.FILES_PATH, 'snapshots'))
+        if options['versions'] and options['snapshots_only']:
+            raise CommandError(
+                'Can not combine --release and --snapshots-only'
+            )
+        start = time.time()
+        self.created = []
+        self.updated = []
+        self.files = 0
+        self.timings = OrderedDict((name, 0.0) for name in PHASES)
+        try:
+            manifest = Manifest(
+                settings.IMPORT_MANIFEST, settings.IMPORT_LOCK
+            )
+            with manifest:
+                # Workers are forked before starting the transaction
+                with process_pool(options['jobs']) as imap:
+                    self.imap = imap
+                    self.process(
+                        manifest,
+                        options['versions'],
+                        options['snapshots_only'],
+                    )
+        except ManifestLocked:
+            raise CommandError('Other import is already running')
+        if self.files or options['verbosity'] > 1:
+            self.report(time.time() - start)
@@ -27,7 +27,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from files.models import Theme
-from files.utils import read_sum
+from files.utils import read_sums
 from data.themes import THEMES
 
 
@@ -62,6 +62,7 @@ class Command(BaseCommand):
                 return
 
         complete_name = os.path.join(path, fullname)
+        sums = read_sums(complete_name)
 
         Theme.objects.get_or_create(
             filename=filename,
@@ -74,20 +75,27 @@ class Command(BaseCommand):
                 'description': data['info'],
                 'url': data['url'] if 'url' in data else '',
                 'author': data['author'],
-                'sha256': read_sum(
-                    '{0}.sha256'.format(complete_name),
-                    complete_name
-                ),
-                'sha1': read_sum(
-                    '{0}.sha1'.format(complete_name),
-                    complete_name
-                ),
+                'sha256': sums['sha256'],
+                'sha1': sums['sha1'],
                 'signed': os.path.exists('{0}.asc'.format(complete_name)),
             }
         )
 
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--theme',
+            action='append',
+            dest='themes',
+            help='Import only given theme file (name/version/filename)',
+        )
+
     def handle(self, *args, **options):
         path = os.path.join(settings.FILES_PATH, 'themes')
+        if options['themes']:
+            for fullname in options['themes']:
+                self.process_theme(path, fullname)
+            return
         for root, dummy, files in os.walk(path):
             for filename in files:
                 if filename.endswith(".zip"):
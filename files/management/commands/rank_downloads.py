@@ -21,21 +21,23 @@
 #
 
 from django.core.management.base import BaseCommand
-from pmaweb.context_processors import releases
+from pmaweb.context_processors import RELEASES
 
 
 class Command(BaseCommand):
     help = 'Ranks releases to be shown'
 
     def handle(self, *args, **options):
-        data = releases()
+        beta = RELEASES.get('beta_release')
 
-        self.stdout.write('Latest: {0}'.format(data['latest']))
-        if data['beta']:
-            self.stdout.write('Beta: {0}'.format(data['beta']))
+        self.stdout.write('Latest: {0}'.format(
+            RELEASES.get('latest_release')
+        ))
+        if beta:
+            self.stdout.write('Beta: {0}'.format(beta))
 
         self.stdout.write('')
 
         self.stdout.write('Releases:')
-        for release in data['releases']:
+        for release in RELEASES.get('releases'):
             self.stdout.write(' * {0}'.format(release))
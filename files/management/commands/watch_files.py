@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from files.watcher import Watcher, DEBOUNCE, RECONCILE, SIDECAR_WAIT
+
+
+class Command(BaseCommand):
+    help = 'Imports releases, snapshots and themes once they are uploaded'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--debounce',
+            type=float,
+            default=DEBOUNCE,
+            help='Seconds without changes before importing',
+        )
+        parser.add_argument(
+            '--wait',
+            type=float,
+            default=SIDECAR_WAIT,
+            help='Seconds to wait for checksum and signature files',
+        )
+        parser.add_argument(
+            '--reconcile',
+            type=float,
+            default=RECONCILE,
+            help='Seconds between full imports',
+        )
+
+    def handle(self, *args, **options):
+        watcher = Watcher(
+            settings.FILES_PATH,
+            stdout=self.stdout,
+            debounce=options['debounce'],
+            wait=options['wait'],
+            reconcile=options['reconcile'],
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
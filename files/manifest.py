@@ -0,0 +1,117 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Stat signatures of directories processed by imports
+
+Directories which did not change since they were imported last time are
+skipped. The lock held while the manifest is used prevents concurrent
+imports.
+"""
+import errno
+import fcntl
+import json
+import os
+
+
+class ManifestLocked(Exception):
+    """Other import is holding the manifest"""
+
+
+def get_signature(path):
+    """Returns size, mtime and inode of directory and files in it"""
+    result = {}
+    for name in ['.'] + os.listdir(path):
+        try:
+            info = os.stat(os.path.join(path, name))
+        except OSError as error:
+            # Removed while scanning
+            if error.errno == errno.ENOENT:
+                continue
+            raise
+        result[name] = [info.st_size, info.st_mtime, info.st_ino]
+    return result
+
+
+def get_names(signature):
+    """Returns names of files in the directory from its signature"""
+    return sorted(name for name in signature if name != '.')
+
+
+class Manifest(object):
+    """Persistent signatures of imported directories
+
+    Without path nothing is stored and every directory is processed, the
+    lock file is used in both cases.
+    """
+    def __init__(self, path, lock_path):
+        self.path = path
+        self.lock_path = lock_path
+        self.entries = {}
+        self.lock = None
+
+    def __enter__(self):
+        self.acquire()
+        if self.path:
+            self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Directories are not recorded when the import failed
+        if self.path and exc_type is None:
+            self.save()
+        self.lock.close()
+        self.lock = None
+
+    def acquire(self):
+        self.lock = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as error:
+            self.lock.close()
+            self.lock = None
+            if error.errno in (errno.EAGAIN, errno.EACCES):
+                raise ManifestLocked(self.lock_path)
+            raise
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as handle:
+                self.entries = json.load(handle)
+        except IOError as error:
+            if error.errno != errno.ENOENT:
+                raise
+            self.entries = {}
+
+    def save(self):
+        temp = '{0}.tmp'.format(self.path)
+        with open(temp, 'w') as handle:
+            json.dump(self.entries, handle, sort_keys=True)
+        os.rename(temp, self.path)
+
+    def get(self, path):
+        """Returns signature recorded by the previous import"""
+        return self.entries.get(path)
+
+    def is_current(self, path, signature):
+        return self.entries.get(path) == signature
+
+    def update(self, path, signature):
+        self.entries[path] = signature
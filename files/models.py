@@ -19,18 +19,28 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import json
-import urllib2
+from contextlib import contextmanager
+from functools import partial
+import threading
+
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 import os.path
+from data.branches import BRANCHES
 from data.themes import CSSMAP
+from files.versions import Version
 from markupfield.fields import MarkupField
-from pmaweb.cdn import purge_cdn, purge_all_cdn
+from pmaweb.cdn import purge_cdn, purge_tagged_cdn
+from pmaweb.dependencies import (
+    release_tag, LATEST, BETA, CURRENT, ALL, SNAPSHOTS
+)
+from pmaweb.snapshot import invalidate, RELEASES_GENERATION
+from pmaweb.renderqueue import enqueue_render, FULL_RENDER
+from pmaweb.artifacts import schedule_artifacts
 
 # Naming of versions
 VERSION_INFO = (
@@ -50,268 +60,149 @@ VERSION_INFO = (
     ('rc', ' Release candidate.'),
 )
 
-DOCKER_TRIGGER = \
-    'https://registry.hub.docker.com/u/phpmyadmin/phpmyadmin/trigger/{0}/'
+# Cache of branch metadata for versions
+BRANCH_INFO = {}
 
+# Releases to purge once the block of coalesce_purges completes
+COALESCED = threading.local()
 
-def get_current_releases():
-    delta = 1000000
-    result = []
 
-    for version in settings.LISTED_BRANCHES:
-        min_vernum = Release.parse_version(version)
-        max_vernum = min_vernum + delta
-        stable_releases = Release.objects.filter(
-            version_num__gte=min_vernum,
-            version_num__lt=max_vernum,
-            stable=True,
-        )
-        if stable_releases.exists():
-            result.append(stable_releases[0])
+def get_version_suffix(version):
+    for match, result in VERSION_INFO:
+        if version.find(match) != -1:
+            return result
+    return ''
 
-    return result
 
+def get_branch_info(version):
+    """Returns metadata of the branch for a version
 
-class Release(models.Model):
-    version = models.CharField(max_length=50, unique=True)
-    version_num = models.IntegerField(default=0, unique=True)
-    release_notes = MarkupField(default_markup_type='markdown')
-    stable = models.BooleanField(default=False, db_index=True)
-    snapshot = models.BooleanField(default=False, db_index=True)
-    date = models.DateTimeField(db_index=True, default=timezone.now)
+    The result is cached per version and includes the full description
+    text of the version.
+    """
+    try:
+        return BRANCH_INFO[version]
+    except KeyError:
+        pass
+    branch = Version(version).branch
+    info = BRANCHES.get(branch, BRANCHES.get(branch.split('.')[0], {}))
+    info = dict(info, **info.get('releases', {}).get(version, {}))
+    info['info'] = ''.join((
+        info.get('description', ''),
+        info.get('support', ''),
+        get_version_suffix(version),
+    ))
+    BRANCH_INFO[version] = info
+    return info
 
-    purged = False
 
-    class Meta(object):
-        ordering = ['-version_num']
+def get_current_releases():
+    # Imported here to avoid circular import
+    from files.catalog import get_catalog
+    return get_catalog().get_current_releases()
+
+
+class ReleaseMixin(object):
+    """Presentation of a release shared with the release catalog"""
+    __slots__ = ()
 
     def __unicode__(self):
         return self.version
 
+    @property
+    def parsed_version(self):
+        return Version(self.version)
+
     def get_absolute_url(self):
         if self.snapshot:
             return reverse('downloads')
         return reverse('release', kwargs={'version': self.version})
 
-    def simpledownload(self):
-        try:
-            return self.download_set.get(
-                filename__endswith='-all-languages.zip'
-            )
-        except Download.DoesNotExist:
-            try:
-                return self.download_set.all()[0]
-            except IndexError:
-                return None
-
-    @staticmethod
-    def parse_version(version):
-        if '+' in version:
-            # Snapshots, eg. 4.7+snapshot
-            parts = [int(x) for x in version.split('+')[0].split('.')]
-            assert len(parts) == 2
-            return (
-                100000000 * parts[0] +
-                1000000 * parts[1]
-            )
-        if '-' in version:
-            version, suffix = version.split('-')
-            if suffix.startswith('alpha'):
-                suffix_num = int(suffix[5:])
-            elif suffix.startswith('beta'):
-                suffix_num = 10 + int(suffix[4:])
-            elif suffix.startswith('rc'):
-                suffix_num = 50 + int(suffix[2:])
-            else:
-                raise ValueError(version)
-        else:
-            suffix_num = 99
-            version = version
-        parts = [int(x) for x in version.split('.')]
-        if len(parts) == 2:
-            parts.append(0)
-        if len(parts) == 3:
-            parts.append(0)
-        assert len(parts) == 4
-        return (
-            100000000 * parts[0] +
-            1000000 * parts[1] +
-            10000 * parts[2] +
-            100 * parts[3] +
-            suffix_num
-        )
-
-    def save(self, *args, **kwargs):
-        self.version_num = self.parse_version(self.version)
-        self.stable = self.version_num % 100 == 99
-        super(Release, self).save(*args, **kwargs)
-
     def get_version_suffix(self):
         '''
         Returns suffix for a version.
         '''
-        for match, result in VERSION_INFO:
-            if self.version.find(match) != -1:
-                return result
-        return ''
+        return get_version_suffix(self.version)
+
+    def get_branch_info(self):
+        return get_branch_info(self.version)
 
     def get_php_versions(self):
-        if self.version[:3] == '5.1':
-            return '>=7.1,<8.0'
-        elif self.version[:3] == '5.0':
-            return '>=7.1,<8.0'
-        elif self.version[:3] == '4.9':
-            return '>=5.5,<8.0'
-        elif self.version[:3] == '4.8':
-            return '>=5.5,<7.3'
-        elif self.version[:3] == '4.7':
-            return '>=5.5,<7.3'
-        elif self.version[:3] == '4.6':
-            return '>=5.5,<7.2'
-        elif self.version[:3] == '4.5':
-            return '>=5.5,<7.1'
-        elif self.version[:3] == '4.4':
-            return '>=5.3,<7.1'
-        elif self.version[:3] == '4.3':
-            return '>=5.3,<7.0'
-        elif self.version[:3] == '4.2':
-            return '>=5.3,<7.0'
-        elif self.version[:3] == '4.1':
-            return '>=5.3,<7.0'
-        elif self.version[:3] == '4.0':
-            return '>=5.2,<5.3'
+        return self.get_branch_info().get('php')
 
     def get_mysql_versions(self):
-        if self.version[:3] == '5.1':
-            return '>=5.5'
-        elif self.version[:3] == '5.0':
-            return '>=5.5'
-        elif self.version[:3] == '4.9':
-            return '>=5.5'
-        elif self.version[:3] == '4.8':
-            return '>=5.5'
-        elif self.version[:3] == '4.7':
-            return '>=5.5'
-        elif self.version[:3] == '4.6':
-            return '>=5.5'
-        elif self.version[:3] == '4.5':
-            return '>=5.5'
-        elif self.version[:3] == '4.4':
-            return '>=5.5'
-        elif self.version[:3] == '4.3':
-            return '>=5.5'
-        elif self.version[:3] == '4.2':
-            return '>=5.5'
-        elif self.version[:3] == '4.1':
-            return '>=5.5'
-        elif self.version[:3] == '4.0':
-            return '>=5.0'
+        return self.get_branch_info().get('mysql')
 
     def get_version_info(self):
         '''
         Returns description to the phpMyAdmin version.
         '''
-        text = ''
-        if self.version[:2] == '0.':
-            text = 'Historical release.'
-        elif self.version[:2] == '1.':
-            text = 'Historical release.'
-        elif self.version[:2] == '2.':
-            text = 'Version compatible with PHP 4+ and MySQL 3+.'
-        elif self.version[:2] == '3.':
-            text = (
-                'Frames version not requiring Javascript. ' +
-                'Requires PHP 5.2 and MySQL 5. ' +
-                'Supported for security fixes only, until Jan 1, 2014.'
-            )
-        elif self.version[:3] == '5.1':
-            text = (
-                'Future version compatible with PHP 7.1 and newer and MySQL 5.5 and newer. '
-            )
-        elif self.version[:3] == '5.0':
-            text = (
-                'Current version compatible with PHP 7.1 and newer and MySQL 5.5 and newer. '
-            )
-        elif self.version[:3] == '4.9':
-            text = (
-                'Older version compatible with PHP 5.5 to 7.4 and MySQL 5.5 and newer. ' +
-                'Currently supported for security fixes only. '
-            )
-        elif self.version[:3] == '4.8':
-            text = (
-                'Older version compatible with PHP 5.5 to 7.2 and MySQL 5.5 and newer. ' +
-                'Was supported until June 4, 2019.'
-            )
-        elif self.version in ('4.7.0', '4.7.1', '4.7.2', '4.7.3', '4.7.0-rc1', '4.7.0-beta1'):
-            text = (
-                'Older version compatible with PHP 5.5 to 7.1 and MySQL 5.5 and newer. ' +
-                'Was supported until April 7, 2018.'
-            )
-        elif self.version[:3] == '4.7':
-            text = (
-                'Older version compatible with PHP 5.5 to 7.2 and MySQL 5.5 and newer. ' +
-                'Was supported until April 7, 2018.'
-            )
-        elif self.version[:3] == '4.6':
-            text = (
-                'Older version compatible with PHP 5.5 to 7.1 and MySQL 5.5 and newer. ' +
-                'Was supported until April 1, 2017.'
-            )
-        elif self.version[:3] == '4.5':
-            text = (
-                'Older version compatible with PHP 5.5 to 7.0 and MySQL 5.5. ' +
-                'Was supported until April 1, 2016.'
-            )
-        elif self.version[:3] == '4.4':
-            text = (
-                'Older version compatible with PHP 5.3.7 to 7.0 and MySQL 5.5. ' +
-                'Was supported until October 1, 2016.'
-            )
-        elif self.version[:3] == '4.3':
-            text = (
-                'Older version compatible with PHP 5.3 and MySQL 5.5. ' +
-                'Was supported until October 1, 2015.'
-            )
-        elif self.version[:3] == '4.2':
-            text = (
-                'Older version compatible with PHP 5.3 and MySQL 5.5. ' +
-                'Was supported until July 1, 2015.'
-            )
-        elif self.version[:3] == '4.1':
-            text = (
-                'Older version compatible with PHP 5.3 and MySQL 5.5. ' +
-                'Was supported until January 1, 2015.'
-            )
-        elif self.version[:3] == '4.0':
-            text = (
-                'Older version compatible with PHP 5.2 and MySQL 5. ' +
-                'Does not support PHP 5.5 or newer. ' +
-                'Was supported until April 1, 2017.'
-            )
-        text += self.get_version_suffix()
+        return self.get_branch_info()['info']
+
+
+class Release(ReleaseMixin, models.Model):
+    version = models.CharField(max_length=50, unique=True)
+    version_num = models.IntegerField(default=0, unique=True)
+    release_notes = MarkupField(default_markup_type='markdown')
+    stable = models.BooleanField(default=False, db_index=True)
+    snapshot = models.BooleanField(default=False, db_index=True)
+    date = models.DateTimeField(db_index=True, default=timezone.now)
+
+    purged = False
+
+    class Meta(object):
+        ordering = ['-version_num']
+
+    def simpledownload(self):
+        # Computed from the downloads list, which comes from the prefetch
+        # cache when listing releases
+        if not hasattr(self, '_simpledownload'):
+            downloads = self.list_downloads()
+            self._simpledownload = None
+            for download in downloads:
+                if download.filename.endswith('-all-languages.zip'):
+                    self._simpledownload = download
+                    break
+            else:
+                if downloads:
+                    self._simpledownload = downloads[0]
+        return self._simpledownload
+
+    @staticmethod
+    def parse_version(version):
+        return Version(version).num
 
-        return text
+    def save(self, *args, **kwargs):
+        version = Version(self.version)
+        self.version_num = version.num
+        self.stable = version.is_stable
+        super(Release, self).save(*args, **kwargs)
 
     def get_downloads(self):
         """Lists downloads, making all-languages.zip first"""
-        dlset = self.download_set
-        return (
-            list(dlset.filter(filename__endswith='all-languages.zip')) +
-            list(dlset.exclude(filename__endswith='all-languages.zip'))
-        )
+        if not hasattr(self, '_downloads'):
+            downloads = self.list_downloads()
+            self._downloads = (
+                [item for item in downloads if item.is_featured] +
+                [item for item in downloads if not item.is_featured]
+            )
+        return self._downloads
 
+    def list_downloads(self):
+        """Lists downloads ordered by filename
 
-class Download(models.Model):
-    release = models.ForeignKey(Release)
-    filename = models.CharField(max_length=50)
-    size = models.IntegerField(default=0)
-    sha1 = models.CharField(max_length=40)
-    sha256 = models.CharField(max_length=64)
-    signed = models.BooleanField(default=False)
+        Uses prefetched downloads when available.
+        """
+        return list(self.download_set.all())
+
+    @property
+    def snapshot_commit(self):
+        return self.release_notes.raw
 
-    class Meta(object):
-        ordering = ['-release__version_num', 'filename']
-        unique_together = ['release', 'filename']
+
+class DownloadMixin(object):
+    """Presentation of a download shared with the release catalog"""
+    __slots__ = ()
 
     def __unicode__(self):
         if self.release.snapshot:
@@ -331,14 +222,6 @@ class Download(models.Model):
     def size_m(self):
         return self.size / (1024 * 1024)
 
-    def get_filesystem_path(self):
-        return os.path.join(
-            settings.FILES_PATH,
-            'phpMyAdmin',
-            self.release.version,
-            self.filename
-        )
-
     def get_absolute_url(self):
         return 'https://files.phpmyadmin.net{0}'.format(
             self.__unicode__()
@@ -397,6 +280,27 @@ class Download(models.Model):
         return self.filename.endswith('all-languages.zip')
 
 
+class Download(DownloadMixin, models.Model):
+    release = models.ForeignKey(Release)
+    filename = models.CharField(max_length=50)
+    size = models.IntegerField(default=0)
+    sha1 = models.CharField(max_length=40)
+    sha256 = models.CharField(max_length=64)
+    signed = models.BooleanField(default=False)
+
+    class Meta(object):
+        ordering = ['-release__version_num', 'filename']
+        unique_together = ['release', 'filename']
+
+    def get_filesystem_path(self):
+        return os.path.join(
+            settings.FILES_PATH,
+            'phpMyAdmin',
+            self.release.version,
+            self.filename
+        )
+
+
 class Theme(models.Model):
     name = models.CharField(max_length=50)
     display_name = models.CharField(max_length=50)
@@ -453,29 +357,58 @@ class Theme(models.Model):
         return CSSMAP[self.supported_versions]
 
 
-def dockerhub_trigger(tag):
-    if settings.DOCKERHUB_TOKEN is None:
-        return
-    request = urllib2.Request(
-        DOCKER_TRIGGER.format(settings.DOCKERHUB_TOKEN),
-        json.dumps({'docker_tag': tag}),
-        {'Content-Type': 'application/json'}
-    )
-    handle = urllib2.urlopen(request)
-    handle.read()
+def get_archive_urls(release):
+    """Returns files archive pages which can list the release"""
+    # Imported here to avoid circular import
+    from files.catalog import get_catalog
+    catalog = get_catalog()
+    branch = release.parsed_version.branch
+    result = set()
+    # Pages both with and without the release as it might be just added
+    for exclude in (None, release.version_num):
+        result.update(catalog.get_archive_urls(exclude=exclude))
+        result.update(catalog.get_archive_urls(branch, exclude=exclude))
+    return sorted(result)
+
+
+def get_release_tags(release):
+    """Returns tags of release data changed by saving the release"""
+    # Imported here to avoid circular import
+    from files.catalog import get_catalog
+    tags = [release_tag(release.version), ALL]
+    if release.snapshot:
+        tags.append(SNAPSHOTS)
+        return tags
+    catalog = get_catalog()
+    branch = catalog.get_branch_latest(release.parsed_version.branch)
+    for tag, current in ((LATEST, catalog.latest), (BETA, catalog.beta),
+                         (CURRENT, branch)):
+        if current is None:
+            # Stable release can not be the missing beta
+            if tag != BETA or not release.stable:
+                tags.append(tag)
+        elif release.version_num >= current.version_num:
+            # Either it is the current one or it might have replaced it
+            tags.append(tag)
+    return tags
+
+
+def unique(items):
+    """Removes duplicates keeping the order"""
+    result = []
+    for item in items:
+        if item not in result:
+            result.append(item)
+    return result
 
 
-@receiver(post_save, sender=Release)
-def purge_release(sender, instance, **kwargs):
-    if instance.purged:
-        return
-    instance.purged = True
-    purge_cdn(
+def get_release_urls(release):
+    """Returns URLs of pages including the release"""
+    return [
         # Pages with _littleboxes.html
         reverse('home'),
         reverse('news'),
         # Download lists
-        reverse('files'),
         reverse('feed-files'),
         reverse('downloads'),
         # Version dumps
@@ -495,17 +428,125 @@ def purge_release(sender, instance, **kwargs):
         reverse('doap'),
         reverse('pad'),
         # This release
-        instance.get_absolute_url(),
-    )
-    # Purge all pages as every page contains download link
-    purge_all_cdn()
+        release.get_absolute_url(),
+    ] + get_archive_urls(release)
+
+
+def get_render_urls(release, tags):
+    """Returns rendered pages to update after saving the release
+
+    Every page shows the latest and beta releases in the download boxes,
+    so all pages are rendered when these might have changed, unless the
+    boxes are included from separate fragment.
+    """
+    # Imported here to avoid circular import
+    from pmaweb.render import RELEASE_FILES
+    urls = []
+    if LATEST in tags or BETA in tags:
+        if not settings.EDGE_INCLUDES:
+            return [FULL_RENDER]
+        urls.extend([
+            reverse('littleboxes'),
+            reverse('about-website'),
+            reverse('pad'),
+            reverse('doap'),
+        ])
+    urls.extend([
+        reverse('downloads'),
+        reverse('feed-files'),
+        reverse(
+            'django.contrib.sitemaps.views.sitemap',
+            kwargs={'section': 'releases'}
+        ),
+    ])
+    urls.extend(RELEASE_FILES)
+    if not release.snapshot:
+        urls.append(release.get_absolute_url())
+        urls.extend(get_archive_urls(release))
+    return urls
+
+
+def purge_releases(releases):
+    """Purges pages including any of the releases at once"""
+    invalidate(RELEASES_GENERATION)
+    # Downloads change the artifacts as well, so publish them on each save
+    schedule_artifacts()
+    urls = []
+    tags = []
+    renders = []
+    for release in releases:
+        if release.purged:
+            continue
+        release.purged = True
+        urls.extend(get_release_urls(release))
+        # Pages showing the release, including every page with download
+        # boxes when it is the latest one
+        release_tags = get_release_tags(release)
+        tags.extend(release_tags)
+        renders.extend(get_render_urls(release, release_tags))
+    if urls:
+        purge_cdn(*unique(urls))
+        purge_tagged_cdn(*unique(tags))
+        if FULL_RENDER in renders:
+            renders = [FULL_RENDER]
+        enqueue_render(*unique(renders))
+
+
+@contextmanager
+def coalesce_purges():
+    """Collects releases saved in the block and purges them once
+
+    Yields dictionary of releases by version, releases changed without
+    signals (for example using bulk_create) should be added to it. The
+    purge is done once the transaction is committed, so that the CDN can
+    not fetch content from before the changes.
+    """
+    releases = getattr(COALESCED, 'releases', None)
+    if releases is not None:
+        # Purged by the outer block
+        yield releases
+        return
+    releases = COALESCED.releases = {}
+    try:
+        yield releases
+    finally:
+        del COALESCED.releases
+    if releases:
+        transaction.on_commit(partial(purge_releases, releases.values()))
+
+
+@receiver(post_save, sender=Release)
+def purge_release(sender, instance, **kwargs):
+    # Nothing is published while loading fixtures
+    if kwargs.get('raw'):
+        invalidate(RELEASES_GENERATION)
+        return
+    releases = getattr(COALESCED, 'releases', None)
+    if releases is not None:
+        releases[instance.version] = instance
+        return
+    purge_releases([instance])
 
 
 @receiver(post_save, sender=Download)
 def purge_download(sender, instance, **kwargs):
-    purge_release(sender, instance.release)
+    purge_release(sender, instance.release, **kwargs)
 
 
 @receiver(post_save, sender=Theme)
 def purge_theme(sender, instance, **kwargs):
+    invalidate()
     purge_cdn(reverse('themes'))
+    enqueue_render(reverse('themes'))
+
+
+@receiver(post_delete, sender=Release)
+@receiver(post_delete, sender=Download)
+def delete_release(sender, instance, **kwargs):
+    invalidate(RELEASES_GENERATION)
+    schedule_artifacts()
+
+
+@receiver(post_delete, sender=Theme)
+def delete_theme(sender, instance, **kwargs):
+    invalidate()
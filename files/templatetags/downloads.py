@@ -26,20 +26,21 @@ from django.template import Library
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
-from files.models import Release
+from files.catalog import get_catalog
+from pmaweb.dependencies import record, release_tag
 
 register = Library()
 
 
 @register.simple_tag
 def releaselink(name):
-    try:
-        release = Release.objects.get(version=name)
-        return mark_safe(
-            '<a href="{0}">{1}</a>'.format(
-                escape(release.get_absolute_url()),
-                escape(release.version)
-            )
-        )
-    except:
+    record(release_tag(name))
+    release = get_catalog().get(name)
+    if release is None:
         return name
+    return mark_safe(
+        '<a href="{0}">{1}</a>'.format(
+            escape(release.get_absolute_url()),
+            escape(release.version)
+        )
+    )
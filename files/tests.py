@@ -20,9 +20,31 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from files.catalog import get_catalog
+from files.composer import minify, normalize_version
 from files.models import Release
-from files.models import Download
+from files.models import Download, Theme
+from files.manifest import Manifest
+from files.utils import CHUNK_SIZE, compute_sums, read_sum, read_sums
+from files.versions import Version, sort_versions
+from files.watcher import Watcher
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from zipfile import ZipFile
+from StringIO import StringIO
 
 
 class ReleaseTest(TestCase):
@@ -122,3 +144,586 @@ class ReleaseTest(TestCase):
             'phpMyAdmin-latest-all-languages.tar.xz'
         )
 
+    def test_version_info(self):
+        release = Release(version='4.7.0-rc1')
+        self.assertEquals(
+            release.get_version_info(),
+            'Older version compatible with PHP 5.5 to 7.1 and MySQL 5.5 '
+            'and newer. Was supported until April 7, 2018. '
+            'First release candidate.'
+        )
+        self.assertEquals(release.get_php_versions(), '>=5.5,<7.3')
+        self.assertEquals(release.get_mysql_versions(), '>=5.5')
+        release = Release(version='2.11.11')
+        self.assertEquals(
+            release.get_version_info(),
+            'Version compatible with PHP 4+ and MySQL 3+.'
+        )
+        self.assertIsNone(release.get_php_versions())
+        release = Release(version='5.10.0')
+        self.assertEquals(release.get_version_info(), '')
+        self.assertIsNone(release.get_php_versions())
+
+
+class VersionTest(TestCase):
+    def test_attributes(self):
+        version = Version('4.9.2-rc1')
+        self.assertEquals(version.num, 409020051)
+        self.assertEquals(version.branch, '4.9')
+        self.assertFalse(version.is_stable)
+        self.assertFalse(version.is_snapshot)
+        version = Version('4.10.1')
+        self.assertEquals(version.branch, '4.10')
+        self.assertTrue(version.is_stable)
+        version = Version('5.0+snapshot')
+        self.assertEquals(version.num, 500000000)
+        self.assertEquals(version.branch, '5.0')
+        self.assertTrue(version.is_snapshot)
+        self.assertFalse(version.is_stable)
+        self.assertIs(Version('4.9.2-rc1'), Version('4.9.2-rc1'))
+        self.assertRaises(ValueError, Version, '4.9.2-gamma1')
+        self.assertRaises(ValueError, Version, 'README.rst')
+        self.assertRaises(AttributeError, setattr, version, 'num', 1)
+
+    def test_compare(self):
+        self.assertLess(Version('4.9.2-beta1'), Version('4.9.2-rc1'))
+        self.assertLess(Version('4.9.2-rc1'), Version('4.9.2'))
+        self.assertGreater(Version('4.10.0'), Version('4.9.10'))
+        self.assertEquals(Version('4.9'), Version('4.9.0.0'))
+        self.assertNotEqual(Version('4.9'), Version('4.9.1'))
+        self.assertEquals(
+            [item.version for item in sort_versions(
+                ['5.0.0', '4.9.1', '5.0+snapshot', '4.10.0', '5.0.0-rc1']
+            )],
+            ['4.9.1', '4.10.0', '5.0+snapshot', '5.0.0-rc1', '5.0.0']
+        )
+
+
+class CatalogTest(TestCase):
+    def create_release(self, version, *filenames):
+        release = Release.objects.create(version=version, release_notes='')
+        for filename in filenames:
+            Download.objects.create(release=release, filename=filename)
+        return release
+
+    def test_catalog(self):
+        self.create_release(
+            '4.9.1',
+            'phpMyAdmin-4.9.1-english.zip',
+            'phpMyAdmin-4.9.1-all-languages.zip',
+        )
+        self.create_release('4.9.2-rc1')
+        self.create_release('4.8.5', 'phpMyAdmin-4.8.5-english.zip')
+        with self.assertNumQueries(1):
+            catalog = get_catalog()
+        with self.assertNumQueries(0):
+            self.assertEquals(catalog.latest.version, '4.9.1')
+            self.assertEquals(catalog.beta.version, '4.9.2-rc1')
+            self.assertEquals(
+                [release.version for release in catalog.get_branch('4.9')],
+                ['4.9.2-rc1', '4.9.1']
+            )
+            self.assertEquals(
+                catalog.get_branch_latest('4.8').version, '4.8.5'
+            )
+            self.assertIsNone(catalog.get_branch_latest('4.7'))
+            release = catalog.get('4.9.1')
+            self.assertEquals(
+                release.simpledownload().filename,
+                'phpMyAdmin-4.9.1-all-languages.zip'
+            )
+            self.assertEquals(
+                [item.filename for item in release.list_downloads()],
+                [
+                    'phpMyAdmin-4.9.1-all-languages.zip',
+                    'phpMyAdmin-4.9.1-english.zip',
+                ]
+            )
+            self.assertEquals(
+                release.get_download('-english.zip').get_absolute_url(),
+                'https://files.phpmyadmin.net/phpMyAdmin/4.9.1/'
+                'phpMyAdmin-4.9.1-english.zip'
+            )
+            self.assertEquals(
+                catalog.get('4.8.5').get_downloads()[0].filename,
+                'phpMyAdmin-4.8.5-english.zip'
+            )
+            self.assertIsNone(catalog.get('4.9.2-rc1').simpledownload())
+
+        # Saving release replaces the catalog
+        self.create_release('4.9.2')
+        catalog = get_catalog()
+        self.assertEquals(catalog.latest.version, '4.9.2')
+        self.assertIsNone(catalog.beta)
+
+
+class ReleaseListTest(TestCase):
+    def create_releases(self, start, count):
+        for minor in range(start, start + count):
+            release = Release.objects.create(
+                version='4.{0}.0'.format(minor), release_notes=''
+            )
+            for flavor in ('english.zip', 'all-languages.zip'):
+                Download.objects.create(
+                    release=release,
+                    filename='phpMyAdmin-{0}-{1}'.format(
+                        release.version, flavor
+                    ),
+                )
+
+    def get_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('files'))
+        self.assertEquals(response.status_code, 200)
+        return len(context), response
+
+    def test_queries(self):
+        self.create_releases(0, 2)
+        queries = self.get_queries()[0]
+        self.create_releases(2, 5)
+        count, response = self.get_queries()
+        self.assertEquals(count, queries)
+        self.assertContains(response, 'phpMyAdmin-4.6.0-all-languages.zip')
+        self.assertNotContains(response, 'phpMyAdmin-4.6.0-english.zip')
+
+    def test_pages(self):
+        self.create_releases(0, 60)
+        response = self.client.get(reverse('files'))
+        self.assertEquals(len(response.context['object_list']), 50)
+        next_page = reverse('files-page', kwargs={'before': 410000099})
+        self.assertEquals(response.context['next_page'], next_page)
+        self.assertEquals(
+            get_catalog().get_archive_urls(),
+            [reverse('files'), next_page]
+        )
+        response = self.client.get(next_page)
+        self.assertEquals(
+            [release.version for release in response.context['object_list']],
+            ['4.{0}.0'.format(minor) for minor in range(9, -1, -1)]
+        )
+        self.assertNotIn('next_page', response.context)
+
+        response = self.client.get(
+            reverse('files-branch', kwargs={'branch': '4.3'})
+        )
+        self.assertEquals(
+            [release.version for release in response.context['object_list']],
+            ['4.3.0']
+        )
+        response = self.client.get(
+            reverse('files-branch', kwargs={'branch': '3.3'})
+        )
+        self.assertEquals(response.status_code, 404)
+
+
+def expand(versions):
+    """Expands minified versions list the same way as Composer does"""
+    result = []
+    expanded = None
+    for version in versions:
+        if expanded is None:
+            expanded = dict(version)
+        else:
+            expanded = dict(expanded)
+            for key, value in version.items():
+                if value == '__unset':
+                    del expanded[key]
+                else:
+                    expanded[key] = value
+        result.append(expanded)
+    return result
+
+
+class ComposerTest(TestCase):
+    def create_release(self, version, filename=None):
+        release = Release.objects.create(version=version, release_notes='')
+        if filename:
+            Download.objects.create(
+                release=release, filename=filename, sha1='1' * 40
+            )
+        return release
+
+    def test_normalize(self):
+        self.assertEquals(normalize_version('4.9.1'), '4.9.1.0')
+        self.assertEquals(normalize_version('2.11.11.3'), '2.11.11.3')
+        self.assertEquals(normalize_version('2.2'), '2.2.0.0')
+        self.assertEquals(normalize_version('4.9.2-rc1'), '4.9.2.0-RC1')
+        self.assertEquals(normalize_version('5.0.0-beta1'), '5.0.0.0-beta1')
+
+    def test_minify(self):
+        versions = [
+            {'version': '2', 'name': 'a', 'extra': 1},
+            {'version': '1', 'name': 'a'},
+            {'version': '0', 'name': 'a', 'extra': 2},
+        ]
+        minified = minify(versions)
+        self.assertEquals(
+            minified[1:],
+            [
+                {'version': '1', 'extra': '__unset'},
+                {'version': '0', 'extra': 2},
+            ]
+        )
+        self.assertEquals(expand(minified), versions)
+
+    def test_metadata(self):
+        self.create_release('4.9.1', 'phpMyAdmin-4.9.1-all-languages.zip')
+        self.create_release(
+            '4.9.2-rc1', 'phpMyAdmin-4.9.2-rc1-english.tar.gz'
+        )
+        self.create_release('4.8.5')
+        response = self.client.get('/packages.json')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEquals(data['metadata-url'], '/p2/%package%.json')
+        # Composer 1 layout
+        self.assertEquals(
+            sorted(data['packages']['phpmyadmin/phpmyadmin']),
+            ['4.9.1', '4.9.2-rc1', 'dev-master']
+        )
+        self.assertEquals(
+            data['packages']['phpmyadmin/phpmyadmin']['4.9.1']['dist'][
+                'shasum'
+            ],
+            '1' * 40
+        )
+
+        response = self.client.get('/p2/phpmyadmin/phpmyadmin.json')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEquals(data['minified'], 'composer/2.0')
+        versions = expand(data['packages']['phpmyadmin/phpmyadmin'])
+        self.assertEquals(
+            [version['version'] for version in versions],
+            ['4.9.2-rc1', '4.9.1']
+        )
+        self.assertEquals(
+            versions[1]['dist'],
+            {
+                'url': 'https://files.phpmyadmin.net/phpMyAdmin/4.9.1/'
+                       'phpMyAdmin-4.9.1-all-languages.zip',
+                'type': 'zip',
+                'shasum': '1' * 40,
+            }
+        )
+        self.assertEquals(versions[0]['dist']['type'], 'tar')
+
+        # Unchanged content is revalidated by its hash
+        etag = response['ETag']
+        response = self.client.get(
+            '/p2/phpmyadmin/phpmyadmin.json', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEquals(response.status_code, 304)
+
+        # Added download changes the content
+        Download.objects.create(
+            release=Release.objects.get(version='4.8.5'),
+            filename='phpMyAdmin-4.8.5-all-languages.zip',
+        )
+        response = self.client.get(
+            '/p2/phpmyadmin/phpmyadmin.json', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEquals(response.status_code, 200)
+        self.assertIn(b'"4.8.5"', response.content)
+
+        response = self.client.get('/p2/phpmyadmin/phpmyadmin~dev.json')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEquals(
+            data['packages']['phpmyadmin/phpmyadmin'][0]['version'],
+            'dev-master'
+        )
+
+
+class ChecksumTest(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.override = self.settings(FILES_PATH=self.tempdir)
+        self.override.enable()
+        release = Release.objects.create(version='4.0.0', release_notes='')
+        directory = os.path.join(self.tempdir, 'phpMyAdmin', '4.0.0')
+        os.makedirs(directory)
+        self.data = {}
+        for name in ('all-languages.zip', 'english.zip'):
+            filename = 'phpMyAdmin-4.0.0-{0}'.format(name)
+            # Larger than the hashing buffer
+            self.data[filename] = os.urandom(CHUNK_SIZE + 1000)
+            with open(os.path.join(directory, filename), 'wb') as handle:
+                handle.write(self.data[filename])
+            Download.objects.create(release=release, filename=filename)
+        self.path = os.path.join(directory, 'phpMyAdmin-4.0.0-english.zip')
+        with open('{0}.sha1'.format(self.path), 'w') as handle:
+            handle.write('{0}  english.zip\n'.format('1' * 40))
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tempdir)
+
+    def test_sums(self):
+        data = self.data['phpMyAdmin-4.0.0-english.zip']
+        self.assertEquals(compute_sums(self.path), {
+            'sha1': hashlib.sha1(data).hexdigest(),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        })
+        self.assertEquals(read_sums(self.path), {
+            'sha1': '1' * 40,
+            'sha256': hashlib.sha256(data).hexdigest(),
+        })
+        self.assertEquals(
+            read_sum('{0}.sha256'.format(self.path), self.path),
+            hashlib.sha256(data).hexdigest()
+        )
+        self.assertEquals(read_sum('{0}.sha256'.format(self.path)), '')
+
+    def test_command(self):
+        call_command(
+            'add_missing_checksums', jobs=2, batch=1, write_sums=True,
+            stdout=StringIO()
+        )
+        for download in Download.objects.all():
+            data = self.data[download.filename]
+            path = download.get_filesystem_path()
+            sha1 = hashlib.sha1(data).hexdigest()
+            sha256 = hashlib.sha256(data).hexdigest()
+            if path == self.path:
+                # Existing sidecar file is used
+                sha1 = '1' * 40
+            self.assertEquals(download.sha1, sha1)
+            self.assertEquals(download.sha256, sha256)
+            self.assertEquals(read_sum('{0}.sha1'.format(path)), sha1)
+            self.assertEquals(read_sum('{0}.sha256'.format(path)), sha256)
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.tempdir, 'manifest.json')
+        self.lock = os.path.join(self.tempdir, 'import.lock')
+        self.queue = os.path.join(self.tempdir, 'queue')
+        self.override = self.settings(
+            FILES_PATH=self.tempdir,
+            IMPORT_MANIFEST=self.manifest,
+            IMPORT_LOCK=self.lock,
+            RENDER_QUEUE=self.queue,
+        )
+        self.override.enable()
+        self.create_file('phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.zip')
+        self.create_file('snapshots/phpMyAdmin-4.9+snapshot-english.zip')
+        self.create_file(
+            'snapshots/phpMyAdmin-4.9+snapshot.json',
+            '{"commit": "abc", "date": "2019-10-10T10:00:00+00:00"}'
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tempdir)
+
+    def create_file(self, name, data='data'):
+        filename = os.path.join(self.tempdir, name)
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as handle:
+            handle.write(data)
+
+    def commit(self):
+        """Runs on commit callbacks, TestCase never commits"""
+        callbacks = connection.run_on_commit
+        connection.run_on_commit = []
+        for sids, func in callbacks:
+            func()
+
+    def test_import(self):
+        call_command('import_files', stdout=StringIO())
+        self.assertEquals(
+            sorted(Download.objects.values_list('filename', flat=True)),
+            [
+                'phpMyAdmin-4.0.0-english.zip',
+                'phpMyAdmin-4.9+snapshot-english.zip',
+            ]
+        )
+        self.assertTrue(Release.objects.get(version='4.9+snapshot').snapshot)
+        # Nothing is purged before commit
+        self.assertFalse(os.path.exists(self.queue))
+        self.commit()
+        # Both releases are purged at once, the new latest release changes
+        # download boxes on all pages
+        with open(self.queue) as handle:
+            self.assertEquals(handle.read(), '*\n')
+
+        # Unchanged directories are skipped
+        with CaptureQueriesContext(connection) as context:
+            call_command('import_files', stdout=StringIO())
+        self.assertEquals(
+            [
+                query for query in context.captured_queries
+                if 'SAVEPOINT' not in query['sql']
+            ],
+            []
+        )
+
+        self.create_file('phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.7z')
+        self.create_file(
+            'phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.7z.sha1', '1' * 40
+        )
+        call_command('import_files', stdout=StringIO())
+        self.assertEquals(
+            Download.objects.get(
+                filename='phpMyAdmin-4.0.0-english.7z'
+            ).sha1,
+            '1' * 40
+        )
+        self.commit()
+
+        # Older release renders only pages listing it
+        os.unlink(self.queue)
+        self.create_file('phpMyAdmin/3.9.0/phpMyAdmin-3.9.0-english.zip')
+        call_command('import_files', stdout=StringIO())
+        self.commit()
+        with open(self.queue) as handle:
+            urls = handle.read().split()
+        self.assertNotIn('*', urls)
+        self.assertIn('/files/3.9.0/', urls)
+        self.assertIn('/downloads/', urls)
+
+    def test_late_signature(self):
+        call_command('import_files', stdout=StringIO())
+        self.create_file(
+            'phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.zip.asc', 'sig'
+        )
+        self.create_file(
+            'phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.zip.sha256', '2' * 64
+        )
+        call_command('import_files', stdout=StringIO())
+        download = Download.objects.get(
+            filename='phpMyAdmin-4.0.0-english.zip'
+        )
+        self.assertTrue(download.signed)
+        self.assertEquals(download.sha256, '2' * 64)
+
+    def test_jobs(self):
+        output = StringIO()
+        call_command('import_files', jobs=2, stdout=output)
+        self.assertEquals(Download.objects.count(), 2)
+        self.assertEquals(
+            Download.objects.get(
+                filename='phpMyAdmin-4.0.0-english.zip'
+            ).sha1,
+            hashlib.sha1('data').hexdigest()
+        )
+        self.assertIn('Processed 2 files', output.getvalue())
+        self.assertIn('read: ', output.getvalue())
+
+    def test_targeted(self):
+        self.create_file('phpMyAdmin/4.0.1/phpMyAdmin-4.0.1-english.zip')
+        call_command('import_files', versions=['4.0.1'], stdout=StringIO())
+        self.assertEquals(
+            list(Release.objects.values_list('version', flat=True)),
+            ['4.0.1']
+        )
+        call_command('import_files', snapshots_only=True, stdout=StringIO())
+        self.assertEquals(
+            sorted(Release.objects.values_list('version', flat=True)),
+            ['4.0.1', '4.9+snapshot']
+        )
+        with self.assertRaises(CommandError):
+            call_command('import_files', versions=['4.0.2'])
+
+    def test_lock(self):
+        with Manifest(self.manifest, self.lock):
+            with self.assertRaises(CommandError):
+                call_command('import_files', stdout=StringIO())
+        # Locking does not depend on the manifest
+        with self.settings(IMPORT_MANIFEST=None):
+            with Manifest(None, self.lock):
+                with self.assertRaises(CommandError):
+                    call_command('import_files', stdout=StringIO())
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'Needs inotify')
+class WatcherTest(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        for name in ('phpMyAdmin', 'snapshots', 'themes'):
+            os.mkdir(os.path.join(self.tempdir, name))
+        self.override = self.settings(FILES_PATH=self.tempdir)
+        self.override.enable()
+        self.watcher = Watcher(self.tempdir, stdout=StringIO(), debounce=0.1)
+        # Initial full import
+        self.watcher.run_once(0)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.override.disable()
+        shutil.rmtree(self.tempdir)
+
+    def create_file(self, name, data='data'):
+        filename = os.path.join(self.tempdir, name)
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as handle:
+            handle.write(data)
+
+    def run_watcher(self, condition, limit=5):
+        end = time.time() + limit
+        while time.time() < end and not condition():
+            self.watcher.run_once(0.1)
+        return condition()
+
+    def test_release(self):
+        name = 'phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.zip'
+        self.create_file(name)
+        self.create_file(name + '.sha256', '2' * 64)
+        # Waiting for the signature
+        self.assertFalse(
+            self.run_watcher(Release.objects.exists, limit=0.5)
+        )
+        self.assertIn(('release', '4.0.0'), self.watcher.pending)
+        self.create_file(name + '.asc')
+        self.assertTrue(self.run_watcher(Download.objects.exists))
+        download = Download.objects.get()
+        self.assertEquals(download.sha256, '2' * 64)
+        self.assertTrue(download.signed)
+        self.assertEquals(self.watcher.pending, {})
+
+    def test_late_signature(self):
+        self.watcher.wait = 0
+        name = 'phpMyAdmin/4.0.0/phpMyAdmin-4.0.0-english.zip'
+        self.create_file(name)
+        self.assertTrue(self.run_watcher(Download.objects.exists))
+        self.assertFalse(Download.objects.get().signed)
+        self.create_file(name + '.asc')
+        self.assertTrue(
+            self.run_watcher(lambda: Download.objects.get().signed)
+        )
+
+    def test_failure(self):
+        def crash():
+            raise ValueError('crash')
+        logging.disable(logging.CRITICAL)
+        try:
+            self.assertFalse(self.watcher.perform(crash))
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_snapshot(self):
+        self.create_file(
+            'snapshots/phpMyAdmin-4.9+snapshot.json',
+            '{"commit": "abc", "date": "2019-10-10T10:00:00+00:00"}'
+        )
+        self.create_file('snapshots/phpMyAdmin-4.9+snapshot-english.zip')
+        self.create_file(
+            'snapshots/phpMyAdmin-4.9+snapshot-english.zip.sha256', '2' * 64
+        )
+        self.assertTrue(self.run_watcher(Download.objects.exists))
+        self.assertTrue(Release.objects.get().snapshot)
+
+    def test_theme(self):
+        filename = os.path.join(self.tempdir, 'themes/dark/1.0/dark-1.0.zip')
+        os.makedirs(os.path.dirname(filename))
+        with ZipFile(filename, 'w') as handle:
+            handle.writestr('dark/theme.json', json.dumps({
+                'name': 'Dark',
+                'supports': ['4.9'],
+                'description': 'Dark theme',
+                'author': 'Author',
+            }))
+        self.create_file('themes/dark/1.0/dark-1.0.zip.sha256', '2' * 64)
+        self.assertTrue(self.run_watcher(Theme.objects.exists))
+        self.assertEquals(Theme.objects.get().sha256, '2' * 64)
@@ -19,7 +19,61 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-from hashlib import sha1, sha256
+from contextlib import contextmanager
+from multiprocessing import Pool
+import hashlib
+import os
+
+from django.db import connection
+
+# Checksums stored for downloads, each in own sidecar file
+ALGORITHMS = ('sha1', 'sha256')
+
+# Size of buffer used for hashing
+CHUNK_SIZE = 1024 * 1024
+
+DOWNLOAD_SUFFIXES = ('.zip', '.7z', '.tar.gz', '.tar.bz2', '.tar.xz')
+
+# Checksum and signature files stored next to downloads
+SIDECAR_SUFFIXES = ('.sha1', '.sha256', '.asc')
+
+
+def list_downloads(names, prefix=''):
+    """Filters names of downloadable archives"""
+    return [
+        name
+        for suffix in DOWNLOAD_SUFFIXES
+        for name in names
+        if name.startswith(prefix) and name.endswith(suffix)
+    ]
+
+
+def compute_sums(filename, algorithms=ALGORITHMS):
+    """Computes checksums in single pass over the file
+
+    The file is read into fixed size buffer, so the memory usage does not
+    depend on file size.
+    """
+    digests = [(name, hashlib.new(name)) for name in algorithms]
+    buf = bytearray(CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(filename, 'rb') as handle:
+        while True:
+            size = handle.readinto(buf)
+            if not size:
+                break
+            for dummy, digest in digests:
+                digest.update(view[:size])
+    return {name: digest.hexdigest() for name, digest in digests}
+
+
+def write_sum(filename, algorithm, value):
+    """Writes checksum sidecar file in the sha1sum format"""
+    sumfile = '{0}.{1}'.format(filename, algorithm)
+    temp = '{0}.tmp'.format(sumfile)
+    with open(temp, 'w') as handle:
+        handle.write('{0}  {1}\n'.format(value, os.path.basename(filename)))
+    os.rename(temp, sumfile)
 
 
 def read_sum(filename, origfile=None):
@@ -28,11 +82,47 @@ def read_sum(filename, origfile=None):
             return handle.read().split()[0]
     except IOError:
         if origfile is not None:
-            with open(origfile, 'r') as handle:
-                data = handle.read()
-            if filename.endswith('.sha1'):
-                return sha1(data).hexdigest()
-            if filename.endswith('.sha256'):
-                return sha256(data).hexdigest()
+            algorithm = filename.rsplit('.', 1)[-1]
+            if algorithm in ALGORITHMS:
+                return compute_sums(origfile, (algorithm,))[algorithm]
 
         return ''
+
+
+def read_sums(filename, write=False):
+    """Returns all checksums of the file
+
+    Checksums are read from sidecar files, missing ones are computed in
+    single pass and optionally written to sidecar files.
+    """
+    sums = {
+        algorithm: read_sum('{0}.{1}'.format(filename, algorithm))
+        for algorithm in ALGORITHMS
+    }
+    missing = [algorithm for algorithm in ALGORITHMS if not sums[algorithm]]
+    if missing:
+        sums.update(compute_sums(filename, missing))
+        if write:
+            for algorithm in missing:
+                write_sum(filename, algorithm, sums[algorithm])
+    return sums
+
+
+@contextmanager
+def process_pool(jobs):
+    """Yields imap like function, using process pool for more jobs
+
+    The workers are forked when entering the block, so it should be outside
+    of transactions. The database connection is closed before that and the
+    workers must not use the database.
+    """
+    if jobs <= 1:
+        yield lambda function, items: (function(item) for item in items)
+        return
+    connection.close()
+    pool = Pool(jobs)
+    try:
+        yield pool.imap
+    finally:
+        pool.terminate()
+        pool.join()
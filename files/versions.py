@@ -0,0 +1,155 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Parsing and ordering of phpMyAdmin version strings"""
+from operator import attrgetter
+
+# Offsets of pre-release suffixes, final release uses 99
+SUFFIXES = (
+    ('alpha', 0),
+    ('beta', 10),
+    ('rc', 50),
+)
+
+# Parsed versions are shared, the cache is dropped once it grows too much
+CACHE = {}
+CACHE_SIZE = 100000
+
+
+class Version(object):
+    """Immutable parsed version
+
+    Instances are memoized, so parsing same string again is only a
+    dictionary lookup. Versions compare by their numeric representation
+    which is stored in Release.version_num.
+    """
+    __slots__ = ('version', 'num', 'branch', 'is_stable', 'is_snapshot')
+
+    def __new__(cls, version):
+        try:
+            return CACHE[version]
+        except KeyError:
+            pass
+        self = object.__new__(cls)
+        num, branch, is_snapshot = parse(version)
+        setter = object.__setattr__
+        setter(self, 'version', version)
+        setter(self, 'num', num)
+        setter(self, 'branch', branch)
+        setter(self, 'is_snapshot', is_snapshot)
+        setter(self, 'is_stable', num % 100 == 99)
+        if len(CACHE) >= CACHE_SIZE:
+            CACHE.clear()
+        CACHE[version] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Version is immutable')
+
+    def __reduce__(self):
+        return (Version, (self.version,))
+
+    def __str__(self):
+        return str(self.version)
+
+    def __repr__(self):
+        return 'Version({0!r})'.format(self.version)
+
+    def __hash__(self):
+        return hash(self.num)
+
+    def __eq__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num == other.num
+
+    def __ne__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num != other.num
+
+    def __lt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num < other.num
+
+    def __le__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num <= other.num
+
+    def __gt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num > other.num
+
+    def __ge__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.num >= other.num
+
+
+def parse(version):
+    """Returns number, branch and snapshot flag for version string"""
+    if '+' in version:
+        # Snapshots, eg. 4.7+snapshot
+        parts = [int(x) for x in version.split('+')[0].split('.')]
+        if len(parts) != 2:
+            raise ValueError(version)
+        return (
+            100000000 * parts[0] + 1000000 * parts[1],
+            '{0}.{1}'.format(*parts),
+            True
+        )
+    suffix_num = 99
+    if '-' in version:
+        version, suffix = version.split('-')
+        for name, offset in SUFFIXES:
+            if suffix.startswith(name):
+                suffix_num = offset + int(suffix[len(name):])
+                break
+        else:
+            raise ValueError(version)
+    parts = [int(x) for x in version.split('.')]
+    if len(parts) < 2 or len(parts) > 4:
+        raise ValueError(version)
+    parts.extend([0] * (4 - len(parts)))
+    return (
+        100000000 * parts[0] +
+        1000000 * parts[1] +
+        10000 * parts[2] +
+        100 * parts[3] +
+        suffix_num,
+        '{0}.{1}'.format(*parts),
+        False
+    )
+
+
+def parse_versions(versions):
+    """Parses version strings, every distinct string is parsed once"""
+    return [Version(version) for version in versions]
+
+
+def sort_versions(versions, reverse=False):
+    """Parses version strings and returns them ordered"""
+    return sorted(
+        parse_versions(versions), key=attrgetter('num'), reverse=reverse
+    )
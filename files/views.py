@@ -25,26 +25,72 @@ from django.views.generic.detail import DetailView
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse, Http404
 from django.shortcuts import redirect
-from files.models import Release, get_current_releases, Download
+from django.utils.cache import get_conditional_response, patch_cache_control
+from files.catalog import (
+    get_catalog, get_archive_url, get_branch_range, ARCHIVE_PAGE_SIZE
+)
+from files.composer import (
+    get_content_hash, get_packages_json, get_metadata_json,
+    get_dev_metadata_json,
+)
+from files.models import Release
+from pmaweb.dependencies import record, release_tag, ALL
 import json
 
 
 class ReleaseList(ListView):
+    """Archive of releases, optionally limited to branch
+
+    Pages are keyed by version_num of the last release on previous page,
+    so adding a release does not change URLs of older pages.
+    """
     model = Release
 
+    def get_allow_empty(self):
+        return 'branch' not in self.kwargs and 'before' not in self.kwargs
+
     def get_queryset(self):
-        return Release.objects.filter(snapshot=False)
+        record(ALL)
+        queryset = Release.objects.filter(snapshot=False)
+        if 'branch' in self.kwargs:
+            min_vernum, max_vernum = get_branch_range(self.kwargs['branch'])
+            queryset = queryset.filter(
+                version_num__gte=min_vernum,
+                version_num__lt=max_vernum,
+            )
+        if 'before' in self.kwargs:
+            queryset = queryset.filter(
+                version_num__lt=int(self.kwargs['before'])
+            )
+        # Fetch one more to know whether there is a next page
+        return queryset.prefetch_related(
+            'download_set'
+        )[:ARCHIVE_PAGE_SIZE + 1]
 
     def get_context_data(self, **kwargs):
+        branch = self.kwargs.get('branch')
+        releases = list(self.object_list)
+        kwargs['object_list'] = releases[:ARCHIVE_PAGE_SIZE]
         context = super(ReleaseList, self).get_context_data(**kwargs)
-        context['page_title'] = 'Files'
+        if len(releases) > ARCHIVE_PAGE_SIZE:
+            context['next_page'] = get_archive_url(
+                branch, releases[ARCHIVE_PAGE_SIZE - 1].version_num
+            )
+        context['first_page'] = get_archive_url(branch)
+        context['is_first_page'] = 'before' not in self.kwargs
+        context['branch'] = branch
+        context['branches'] = get_catalog().get_branch_names()
+        if branch:
+            context['page_title'] = 'Files for {0}'.format(branch)
+        else:
+            context['page_title'] = 'Files'
         context['page_rss'] = reverse('feed-files')
         context['page_rss_title'] = 'phpMyAdmin releases'
         return context
 
 
 class ReleaseDetail(DetailView):
-    model = Release
+    queryset = Release.objects.prefetch_related('download_set')
 
     def get_object(self, queryset=None):
         if queryset is None:
@@ -61,42 +107,70 @@ class ReleaseDetail(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(ReleaseDetail, self).get_context_data(**kwargs)
+        record(release_tag(self.object.version))
         context['page_title'] = self.object.version
         context['page_rss'] = reverse('feed-files')
         context['page_rss_title'] = 'phpMyAdmin releases'
         return context
 
 
-def version_json(request):
-    latest = Release.objects.filter(stable=True)[0]
+def get_version_json():
+    """Returns serialized version information"""
+    catalog = get_catalog()
+    latest = catalog.latest
     response = {
         'version': latest.version,
         'date': latest.date.date().isoformat(),
         'releases': [],
     }
-    for release in get_current_releases():
+    for release in catalog.get_current_releases():
         response['releases'].append({
             'version': release.version,
             'date': release.date.date().isoformat(),
             'php_versions': release.get_php_versions(),
             'mysql_versions': release.get_mysql_versions(),
         })
+    return json.dumps(response, indent=4)
+
+
+def version_json(request):
     return HttpResponse(
-        json.dumps(response, indent=4),
+        get_version_json(),
         content_type='application/json'
     )
 
 
+def composer_response(request, content):
+    """Serves Composer metadata, cacheable by its content hash"""
+    record(ALL)
+    etag = '"{0}"'.format(get_content_hash(content))
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=300)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def composer_packages(request):
+    return composer_response(request, get_packages_json())
+
+
+def composer_metadata(request):
+    return composer_response(request, get_metadata_json())
+
+
+def composer_dev_metadata(request):
+    return composer_response(request, get_dev_metadata_json())
+
+
 def latest_download(request, flavor, extension, checksum=None):
-    latest = Release.objects.filter(stable=True)[0]
-    try:
-        result = latest.download_set.get(
-            filename__endswith='-{0}{1}'.format(flavor, extension)
-        )
-        if checksum == '.asc':
-            return redirect(result.get_signed_url(), permanent=False)
-        if checksum == '.sha256':
-            return redirect(result.get_checksum_url(), permanent=False)
-        return redirect(result, permanent=False)
-    except Download.DoesNotExist:
+    latest = get_catalog().latest
+    result = None
+    if latest is not None:
+        result = latest.get_download('-{0}{1}'.format(flavor, extension))
+    if result is None:
         raise Http404("No release found matching the query")
+    if checksum == '.asc':
+        return redirect(result.get_signed_url(), permanent=False)
+    if checksum == '.sha256':
+        return redirect(result.get_checksum_url(), permanent=False)
+    return redirect(result, permanent=False)
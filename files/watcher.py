@@ -0,0 +1,302 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Imports files as soon as they are uploaded
+
+Linux inotify reports files written or moved into the release, snapshot
+and theme directories. Events are debounced and the import waits for the
+checksum and signature files, then only the affected release, snapshots
+or theme are imported. Full imports are still run periodically to catch
+anything missed, and they are the only mechanism without inotify.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import close_old_connections
+
+from files.utils import SIDECAR_SUFFIXES, list_downloads
+
+LOGGER = logging.getLogger('files.watcher')
+
+# Event masks from sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+)
+
+EVENT = struct.Struct('iIII')
+
+# Seconds without events before importing
+DEBOUNCE = 2
+
+# Seconds to wait for the sidecar files before importing anyway
+SIDECAR_WAIT = 300
+
+# Seconds between full imports
+RECONCILE = 3600
+
+# Seconds before retrying failed import
+RETRY = 30
+
+# Files expected next to every archive
+SIDECARS = {
+    'release': ('.sha256', '.asc'),
+    'snapshots': ('.sha256',),
+    'theme': ('.sha256',),
+}
+
+
+class Inotify(object):
+    """Minimal binding of the Linux inotify interface"""
+    def __init__(self):
+        self.libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'Failed to initialize inotify')
+        self.paths = {}
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        if not isinstance(path, bytes):
+            path = path.encode('utf-8')
+        wd = self.libc.inotify_add_watch(self.fd, path, mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        self.paths[wd] = path
+
+    def read(self, timeout):
+        """Returns list of events as directory, name and mask"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, dummy, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            events.append((self.paths.get(wd), name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher(object):
+    """Imports releases, snapshots and themes once their files change"""
+    def __init__(self, root, stdout=None, debounce=DEBOUNCE,
+                 wait=SIDECAR_WAIT, reconcile=RECONCILE):
+        self.releases = os.path.join(root, 'phpMyAdmin')
+        self.snapshots = os.path.join(root, 'snapshots')
+        self.themes = os.path.join(root, 'themes')
+        self.stdout = stdout
+        self.debounce = debounce
+        self.wait = wait
+        self.interval = reconcile
+        # Targets waiting for import, mapped to due and first event time
+        self.pending = {}
+        self.next_reconcile = 0
+        try:
+            self.inotify = Inotify()
+        except OSError as error:
+            LOGGER.warning('Only periodic imports are done: %s', error)
+            self.inotify = None
+        else:
+            for path in (self.releases, self.snapshots, self.themes):
+                self.add_tree(path)
+
+    def add_tree(self, path):
+        """Watches directory and its subdirectories
+
+        Returns files already present, they could be written before the
+        watch was added.
+        """
+        result = []
+        for root, dummy, files in os.walk(path):
+            try:
+                self.inotify.add_watch(root)
+            except OSError as error:
+                # Removed meanwhile
+                if error.errno != errno.ENOENT:
+                    raise
+            result.extend(os.path.join(root, name) for name in files)
+        return result
+
+    def get_target(self, path):
+        """Returns what should be imported after change of the path"""
+        directory, name = os.path.split(path)
+        if directory == self.releases:
+            return ('release', name)
+        if os.path.dirname(directory) == self.releases:
+            return ('release', os.path.basename(directory))
+        if directory == self.snapshots:
+            return ('snapshots', None)
+        if path.startswith(self.themes + os.sep):
+            theme = path[len(self.themes) + 1:]
+            for suffix in SIDECAR_SUFFIXES:
+                if theme.endswith(suffix):
+                    theme = theme[:-len(suffix)]
+            if theme.count(os.sep) == 2 and theme.endswith('.zip'):
+                return ('theme', theme)
+        return None
+
+    def handle_event(self, directory, name, mask, now):
+        if mask & IN_Q_OVERFLOW or directory is None:
+            # Events were lost
+            self.next_reconcile = now
+            return
+        path = os.path.join(directory, name)
+        paths = [path]
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            paths.extend(self.add_tree(path))
+        for path in paths:
+            self.schedule(self.get_target(path), now)
+
+    def schedule(self, target, now):
+        if target is not None:
+            dummy, first = self.pending.get(target, (None, now))
+            self.pending[target] = (now + self.debounce, first)
+
+    def get_archives(self, target):
+        kind, value = target
+        if kind == 'theme':
+            return [os.path.join(self.themes, value)]
+        if kind == 'release':
+            path = os.path.join(self.releases, value)
+        else:
+            path = self.snapshots
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return []
+        return [os.path.join(path, name) for name in list_downloads(names)]
+
+    def is_ready(self, target):
+        """Checks whether all archives have their sidecar files"""
+        return all(
+            os.path.exists(archive + suffix)
+            for archive in self.get_archives(target)
+            for suffix in SIDECARS[target[0]]
+        )
+
+    def import_target(self, target):
+        kind, value = target
+        if kind == 'release':
+            if os.path.isdir(os.path.join(self.releases, value)):
+                call_command(
+                    'import_files', versions=[value], stdout=self.stdout
+                )
+        elif kind == 'snapshots':
+            call_command(
+                'import_files', snapshots_only=True, stdout=self.stdout
+            )
+        elif os.path.exists(os.path.join(self.themes, value)):
+            call_command('import_themes', themes=[value], stdout=self.stdout)
+
+    def reconcile(self):
+        call_command('import_files', stdout=self.stdout)
+        call_command('import_themes', stdout=self.stdout)
+
+    def perform(self, function, *args):
+        """Runs import, returns False if it should be retried"""
+        close_old_connections()
+        try:
+            function(*args)
+        except CommandError as error:
+            LOGGER.warning('Import failed, will retry: %s', error)
+            return False
+        except Exception:
+            # Keep watching, the event is retried later
+            LOGGER.exception('Import crashed, will retry')
+            return False
+        return True
+
+    def process_pending(self, now):
+        for target, (due, first) in sorted(self.pending.items()):
+            if due > now:
+                continue
+            if not self.is_ready(target) and first + self.wait > now:
+                self.pending[target] = (now + self.debounce, first)
+                continue
+            if self.perform(self.import_target, target):
+                del self.pending[target]
+            else:
+                self.pending[target] = (now + RETRY, first)
+
+    def get_timeout(self, now, limit):
+        dues = [due for due, dummy in self.pending.values()]
+        dues.append(self.next_reconcile)
+        return max(0, min(min(dues) - now, limit))
+
+    def run_once(self, limit=60):
+        """Waits for events up to limit seconds and performs due imports"""
+        now = time.time()
+        if now >= self.next_reconcile:
+            if self.perform(self.reconcile):
+                self.next_reconcile = now + self.interval
+            else:
+                self.next_reconcile = now + RETRY
+        timeout = self.get_timeout(time.time(), limit)
+        if self.inotify is None:
+            time.sleep(timeout)
+        else:
+            for directory, name, mask in self.inotify.read(timeout):
+                self.handle_event(directory, name, mask, time.time())
+        self.process_pending(time.time())
+
+    def run(self):
+        while True:
+            self.run_once()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
@@ -21,7 +21,8 @@
 #
 from django.core.management.base import BaseCommand, CommandError
 import feedparser
-from urllib2 import urlopen
+
+from pmaweb.httpclient import get
 
 
 class FeedCommand(BaseCommand):
@@ -31,9 +32,7 @@ class FeedCommand(BaseCommand):
         raise NotImplementedError()
 
     def handle(self, *args, **options):
-        handle = urlopen(self.url)
-        data = handle.read()
-        parsed = feedparser.parse(data)
+        parsed = feedparser.parse(get(self.url).content)
         if parsed.bozo == 1:
             raise CommandError(parsed.bozo_exception)
         else:
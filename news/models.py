@@ -22,12 +22,14 @@
 
 from django.dispatch import receiver
 from django.core.urlresolvers import reverse
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 from markupfield.fields import MarkupField
 from pmaweb.cdn import purge_cdn
+from pmaweb.snapshot import invalidate, NEWS_GENERATION
+from pmaweb.renderqueue import enqueue_render
 
 
 class Post(models.Model):
@@ -77,11 +79,16 @@ class Planet(models.Model):
 
 @receiver(post_save, sender=Post)
 def purge_post(sender, instance, **kwargs):
+    invalidate(NEWS_GENERATION)
     num_pages = 1 + (Post.objects.count() / 10)
     pages = [
         reverse('home'),
         reverse('news'),
         reverse('feed-news'),
+        reverse(
+            'django.contrib.sitemaps.views.sitemap',
+            kwargs={'section': 'news'}
+        ),
         instance.get_absolute_url(),
     ]
     pages.extend([
@@ -89,8 +96,20 @@ def purge_post(sender, instance, **kwargs):
         for x in range(num_pages)
     ])
     purge_cdn(*pages)
+    enqueue_render(*pages)
 
 
 @receiver(post_save, sender=Planet)
 def purge_planet(sender, instance, **kwargs):
+    invalidate()
     purge_cdn(reverse('home'))
+    enqueue_render(reverse('home'))
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Planet)
+def delete_news(sender, instance, **kwargs):
+    if sender is Post:
+        invalidate(NEWS_GENERATION)
+    else:
+        invalidate()
@@ -0,0 +1,519 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Non-blocking proxy for the GitHub API endpoints
+
+Serves ``/api/commit/`` and ``/api/tree/`` on single event loop, so that
+slow upstream responses do not hold WSGI workers of the website. Many
+requests are multiplexed over the loop, the number of concurrent upstream
+connections is limited per host and both upstream requests and clients
+are subject to timeouts.
+
+Responses share the disk cache and its locks with the Django views in
+pmaweb.proxycache and concurrent requests for the same object wait for
+single upstream request. Upstream hosts are resolved outside of the loop.
+"""
+import asynchat
+import asyncore
+from collections import deque
+import logging
+import re
+import socket
+import ssl
+import sys
+import threading
+import time
+from urlparse import urlsplit
+
+from django.conf import settings
+
+from pmaweb.httpclient import USER_AGENT
+from pmaweb.proxycache import (
+    Entry, TTL, acquire, get_headers, get_path, read_entry, write_entry,
+)
+
+LOGGER = logging.getLogger('pmaweb.apiproxy')
+
+ROUTES = (
+    (re.compile(r'^/api/commit/([a-f0-9]{40})/'), 'commits'),
+    (re.compile(r'^/api/tree/([a-zA-Z0-9_]*)/'), 'trees'),
+)
+
+# Max age of responses as sent by the Django views
+MAX_AGE = {
+    'commits': 86400,
+    'trees': 600,
+}
+
+MAX_HEADER = 16384
+MAX_RESPONSE = 16 * 1024 * 1024
+
+# Seconds between lookups of upstream addresses
+RESOLVE_INTERVAL = 300
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    502: 'Bad Gateway',
+    504: 'Gateway Timeout',
+}
+
+TIMEOUT = 'Upstream request timed out'
+
+
+def decode_chunked(data):
+    """Decodes chunked body, raises ValueError when it is incomplete"""
+    chunks = []
+    while True:
+        line, separator, data = data.partition(b'\r\n')
+        if not separator:
+            raise ValueError('Incomplete chunked response')
+        size = int(line.split(b';', 1)[0], 16)
+        if size == 0:
+            return b''.join(chunks)
+        if len(data) < size + 2:
+            raise ValueError('Incomplete chunked response')
+        chunks.append(data[:size])
+        data = data[size + 2:]
+
+
+def parse_response(data):
+    """Parses HTTP response, returns status, headers and content
+
+    Raises ValueError when the response is not complete.
+    """
+    head, separator, content = data.partition(b'\r\n\r\n')
+    if not separator:
+        raise ValueError('Incomplete response')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, value = line.split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        content = decode_chunked(content)
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if len(content) < length:
+            raise ValueError('Truncated response')
+        content = content[:length]
+    return status, headers, content
+
+
+class UpstreamRequest(object):
+    """Request waiting for upstream connection or being performed"""
+    def __init__(self, url, headers, callback):
+        self.url = urlsplit(url)
+        self.headers = headers
+        self.callback = callback
+        self.deadline = time.time() + settings.HTTP_TIMEOUT
+        self.done = False
+
+    def get_data(self):
+        path = self.url.path or '/'
+        if self.url.query:
+            path = '{0}?{1}'.format(path, self.url.query)
+        lines = ['GET {0} HTTP/1.0'.format(path)]
+        lines.append('Host: {0}'.format(self.url.netloc))
+        lines.append('User-Agent: {0}'.format(USER_AGENT))
+        lines.append('Accept: application/json')
+        for name, value in sorted(self.headers.items()):
+            lines.append('{0}: {1}'.format(name, value))
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def complete(self, response=None, error=None):
+        if not self.done:
+            self.done = True
+            self.callback(response, error)
+
+
+class UpstreamChannel(asynchat.async_chat):
+    """Connection performing single upstream request"""
+    def __init__(self, upstream, request):
+        asynchat.async_chat.__init__(self, map=upstream.server.map)
+        self.upstream = upstream
+        self.request = request
+        self.deadline = request.deadline
+        self.buffer = []
+        self.size = 0
+        self.handshaking = False
+        self.set_terminator(None)
+        family, address = upstream.address
+        self.create_socket(family, socket.SOCK_STREAM)
+        self.connect(address)
+
+    def handle_connect(self):
+        if self.upstream.secure:
+            context = ssl.create_default_context()
+            wrapped = context.wrap_socket(
+                self.socket,
+                server_hostname=self.upstream.host,
+                do_handshake_on_connect=False,
+            )
+            self.del_channel()
+            self.set_socket(wrapped)
+            self.handshaking = True
+            self.handshake()
+        else:
+            self.push(self.request.get_data())
+
+    def handshake(self):
+        try:
+            self.socket.do_handshake()
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return
+        self.handshaking = False
+        self.push(self.request.get_data())
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        if self.handshaking:
+            return True
+        return asynchat.async_chat.writable(self)
+
+    def handle_read(self):
+        if self.handshaking:
+            self.handshake()
+            return
+        asynchat.async_chat.handle_read(self)
+        # Data already decrypted by SSL are not signalled by select
+        while self.connected and getattr(self.socket, 'pending', None):
+            if not self.socket.pending():
+                break
+            asynchat.async_chat.handle_read(self)
+
+    def handle_write(self):
+        if self.handshaking:
+            self.handshake()
+            return
+        asynchat.async_chat.handle_write(self)
+
+    def recv(self, buffer_size):
+        try:
+            return asynchat.async_chat.recv(self, buffer_size)
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return b''
+
+    def send(self, data):
+        try:
+            return asynchat.async_chat.send(self, data)
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return 0
+
+    def collect_incoming_data(self, data):
+        self.size += len(data)
+        if self.size > MAX_RESPONSE:
+            self.finish(error='Upstream response too large')
+            return
+        self.buffer.append(data)
+
+    def handle_close(self):
+        try:
+            response = parse_response(b''.join(self.buffer))
+        except (ValueError, IndexError) as error:
+            self.finish(error='Invalid upstream response: {0}'.format(error))
+        else:
+            self.finish(response)
+
+    def handle_error(self):
+        self.finish(
+            error='Upstream request failed: {0}'.format(sys.exc_info()[1])
+        )
+
+    def handle_timeout(self):
+        self.finish(error=TIMEOUT)
+
+    def finish(self, response=None, error=None):
+        self.close()
+        self.deadline = None
+        if not self.request.done:
+            self.upstream.finished()
+            self.request.complete(response, error)
+
+
+class Upstream(object):
+    """Limits number of concurrent connections to single host"""
+    def __init__(self, server, url):
+        self.server = server
+        self.secure = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.secure else 80)
+        self.limit = settings.API_PROXY_CONNECTIONS
+        self.active = 0
+        self.queue = deque()
+        self.address = None
+        self.resolve()
+
+    def resolve(self):
+        """Looks up the address, blocks so it is done outside the loop"""
+        info = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)
+        self.address = (info[0][0], info[0][4])
+
+    def submit(self, request):
+        self.queue.append(request)
+        self.dispatch()
+
+    def dispatch(self):
+        while self.queue and self.active < self.limit:
+            self.active += 1
+            UpstreamChannel(self, self.queue.popleft())
+
+    def finished(self):
+        self.active -= 1
+        self.dispatch()
+
+    def check_timeouts(self, now):
+        expired = [
+            request for request in self.queue if request.deadline < now
+        ]
+        for request in expired:
+            self.queue.remove(request)
+            request.complete(error=TIMEOUT)
+
+
+class ClientChannel(asynchat.async_chat):
+    """Connection from client, answers single request"""
+    def __init__(self, server, sock):
+        asynchat.async_chat.__init__(self, sock, map=server.map)
+        self.server = server
+        self.deadline = time.time() + settings.HTTP_TIMEOUT
+        self.buffer = []
+        self.size = 0
+        self.received = False
+        self.set_terminator(b'\r\n\r\n')
+
+    def collect_incoming_data(self, data):
+        if self.received:
+            return
+        self.size += len(data)
+        if self.size > MAX_HEADER:
+            self.respond(400, b'Request header too large')
+            return
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        self.set_terminator(None)
+        if self.received:
+            return
+        self.received = True
+        # Waiting for upstream is limited by its own timeout
+        self.deadline = None
+        head = b''.join(self.buffer).decode('latin-1')
+        self.buffer = []
+        parts = head.split('\r\n', 1)[0].split()
+        if len(parts) != 3:
+            self.respond(400, b'Bad request')
+        elif parts[0] != 'GET':
+            self.respond(405, b'Only GET is allowed')
+        else:
+            self.server.handle_request(self, parts[1].split('?', 1)[0])
+
+    def respond(self, status, content, headers=()):
+        self.received = True
+        if not self.connected:
+            return
+        lines = ['HTTP/1.0 {0} {1}'.format(status, REASONS[status])]
+        lines.append('Content-Type: application/json')
+        lines.append('Content-Length: {0}'.format(len(content)))
+        lines.append('Connection: close')
+        for header in headers:
+            lines.append('{0}: {1}'.format(*header))
+        head = '\r\n'.join(lines) + '\r\n\r\n'
+        self.push(head.encode('latin-1') + content)
+        self.close_when_done()
+        self.deadline = time.time() + settings.HTTP_TIMEOUT
+
+    def handle_timeout(self):
+        self.close()
+
+    def handle_error(self):
+        LOGGER.exception('Failed to handle API proxy client')
+        self.close()
+
+
+class ProxyServer(asyncore.dispatcher):
+    """Event loop serving the API endpoints"""
+    def __init__(self, address):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(address)
+        self.listen(128)
+        self.upstreams = {}
+        self.flights = {}
+        # Flights waiting for other process fetching the same object
+        self.waiting = {}
+        self.running = False
+        self.stopped = threading.Event()
+        self.get_upstream(urlsplit(settings.GITHUB_API))
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            ClientChannel(self, pair[0])
+
+    def handle_request(self, channel, path):
+        for regex, kind in ROUTES:
+            match = regex.match(path)
+            if match:
+                self.lookup(kind, match.group(1), channel)
+                return
+        channel.respond(404, b'Not found')
+
+    def lookup(self, kind, name, channel):
+        """Responds from cache or waits for upstream response"""
+        path = get_path(kind, name) if settings.GITHUB_CACHE else None
+        entry = read_entry(path) if path else None
+        if entry is None:
+            self.fetch(kind, name, path, None, channel)
+            return
+        if not entry.is_fresh(TTL[kind]):
+            # Serve stale response and revalidate it in the background
+            self.fetch(kind, name, path, entry, None)
+        self.respond(kind, channel, entry)
+
+    def fetch(self, kind, name, path, previous, channel):
+        """Starts upstream request unless same one is in progress"""
+        key = (kind, name)
+        if key in self.flights:
+            if channel is not None:
+                self.flights[key].append(channel)
+            return
+        self.flights[key] = [] if channel is None else [channel]
+        self.start(kind, name, path, previous, time.time())
+
+    def start(self, kind, name, path, previous, started):
+        """Requests upstream while holding the cache lock"""
+        key = (kind, name)
+        lock = None
+        if path is not None:
+            lock = acquire(path, blocking=False)
+            if lock is None:
+                # Other process is fetching it, retried from the loop
+                self.waiting[key] = (path, previous, started)
+                return
+            entry = read_entry(path)
+            if entry is not None and entry.is_fresh(TTL[kind]):
+                lock.close()
+                self.complete(kind, key, entry)
+                return
+            if entry is not None:
+                previous = entry
+        headers = get_headers()
+        if previous is not None and previous.etag:
+            headers['If-None-Match'] = previous.etag
+
+        def callback(response, error):
+            try:
+                self.fetched(kind, key, path, previous, response, error)
+            finally:
+                if lock is not None:
+                    lock.close()
+
+        url = '{0}{1}/{2}'.format(settings.GITHUB_API, kind, name)
+        request = UpstreamRequest(url, headers, callback)
+        self.get_upstream(request.url).submit(request)
+
+    def fetched(self, kind, key, path, previous, response, error):
+        entry = None
+        if error is not None:
+            LOGGER.warning('GitHub API request failed: %s', error)
+        elif response[0] == 304 and previous is not None:
+            entry = Entry(previous.content, previous.etag, time.time())
+        elif response[0] == 200:
+            entry = Entry(response[2], response[1].get('etag'), time.time())
+        if entry is not None and path is not None:
+            write_entry(path, entry)
+        self.complete(kind, key, entry, response, error)
+
+    def complete(self, kind, key, entry, response=None, error=None):
+        """Answers clients waiting for the flight"""
+        channels = self.flights.pop(key)
+        for channel in channels:
+            if entry is not None:
+                self.respond(kind, channel, entry)
+            elif error == TIMEOUT:
+                channel.respond(504, error.encode('utf-8'))
+            elif error is not None:
+                channel.respond(502, error.encode('utf-8'))
+            elif response[0] == 404:
+                channel.respond(404, response[2])
+            else:
+                channel.respond(502, response[2])
+
+    def respond(self, kind, channel, entry):
+        channel.respond(200, entry.content, [
+            ('Cache-Control', 'max-age={0}'.format(MAX_AGE[kind])),
+        ])
+
+    def get_upstream(self, url):
+        key = (url.scheme, url.netloc)
+        if key not in self.upstreams:
+            self.upstreams[key] = Upstream(self, url)
+        return self.upstreams[key]
+
+    def check_timeouts(self):
+        now = time.time()
+        for channel in list(self.map.values()):
+            deadline = getattr(channel, 'deadline', None)
+            if deadline is not None and deadline < now:
+                channel.handle_timeout()
+        for upstream in self.upstreams.values():
+            upstream.check_timeouts(now)
+        for key, (path, previous, started) in list(self.waiting.items()):
+            del self.waiting[key]
+            if started + settings.HTTP_TIMEOUT < now:
+                self.complete(key[0], key, None, error=TIMEOUT)
+            else:
+                self.start(key[0], key[1], path, previous, started)
+
+    def resolve_forever(self):
+        while not self.stopped.wait(RESOLVE_INTERVAL):
+            for upstream in list(self.upstreams.values()):
+                try:
+                    upstream.resolve()
+                except socket.error as error:
+                    LOGGER.warning(
+                        'Failed to resolve %s: %s', upstream.host, error
+                    )
+
+    def serve_forever(self, poll=0.5):
+        self.running = True
+        self.stopped.clear()
+        resolver = threading.Thread(target=self.resolve_forever)
+        resolver.daemon = True
+        resolver.start()
+        while self.running:
+            asyncore.loop(poll, map=self.map, count=1)
+            self.check_timeouts()
+        for channel in list(self.map.values()):
+            channel.close()
+
+    def shutdown(self):
+        """Stops the loop, can be called from other thread"""
+        self.running = False
+        self.stopped.set()
@@ -0,0 +1,117 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Publishing of machine readable files
+
+These files depend only on releases, so they are rendered once the
+releases change and can be served by the web server. Django views for
+the same URLs are kept as a fallback.
+"""
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from pmaweb.output import write_file
+
+# Artifacts with their templates and content types, artifacts without
+# template are serialized by code
+ARTIFACTS = {
+    'version.txt': ('version/version.txt', 'text/plain'),
+    'version.js': ('version/version.js', 'application/javascript'),
+    'version.json': (None, 'application/json'),
+    'list.txt': ('version/list.txt', 'text/plain'),
+    'packages.json': (None, 'application/json'),
+    'composer': (None, 'application/json'),
+    'composer-dev': (None, 'application/json'),
+    'pad': ('phpmyadmin.xml', 'application/xml'),
+    'doap': ('phpmyadmin-doap.xml', 'application/xml'),
+}
+
+# Published paths of the artifacts
+PATHS = {
+    'downloads/list.txt': 'list.txt',
+    'packages.json': 'packages.json',
+    'p2/phpmyadmin/phpmyadmin.json': 'composer',
+    'p2/phpmyadmin/phpmyadmin~dev.json': 'composer-dev',
+    'home_page/phpmyadmin.xml': 'pad',
+    'home_page/phpmyadmin-doap.xml': 'doap',
+}
+for prefix in ('', 'home_page/'):
+    for name in ('latest', 'version'):
+        for ext in ('php', 'txt'):
+            PATHS['{0}{1}.{2}'.format(prefix, name, ext)] = 'version.txt'
+    PATHS['{0}version.js'.format(prefix)] = 'version.js'
+    PATHS['{0}version.json'.format(prefix)] = 'version.json'
+
+
+def render_artifacts(names=None):
+    """Renders artifacts, returns dictionary of encoded content"""
+    # Imported here to avoid circular import through models
+    from files.composer import (
+        get_packages_json, get_metadata_json, get_dev_metadata_json
+    )
+    from files.views import get_version_json
+    from pmaweb.context_processors import RELEASES
+    builders = {
+        'version.json': get_version_json,
+        'packages.json': get_packages_json,
+        'composer': get_metadata_json,
+        'composer-dev': get_dev_metadata_json,
+    }
+    if names is None:
+        names = ARTIFACTS
+    context = RELEASES.context()
+    result = {}
+    for name in names:
+        template = ARTIFACTS[name][0]
+        if template is None:
+            content = builders[name]()
+        else:
+            content = render_to_string(template, context)
+        result[name] = content.encode('utf-8')
+    return result
+
+
+def publish_artifacts(root=None):
+    """Writes changed artifacts into the directory, returns their paths"""
+    if root is None:
+        root = settings.ARTIFACTS_PATH
+    artifacts = render_artifacts()
+    result = []
+    for path in sorted(PATHS):
+        content = artifacts[PATHS[path]]
+        filename = os.path.join(root, path)
+        if os.path.exists(filename):
+            with open(filename, 'rb') as handle:
+                if handle.read() == content:
+                    continue
+        write_file(filename, content)
+        result.append(path)
+    return result
+
+
+def schedule_artifacts():
+    """Publishes artifacts once current transaction is committed"""
+    if settings.ARTIFACTS_PATH is None:
+        return
+    transaction.on_commit(publish_artifacts)
@@ -19,21 +19,26 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
-"""CDN integration"""
+"""CDN integration
+
+Purges are queued as jobs, see pmaweb.jobs, the functions performing the
+API requests are called by the worker.
+"""
 from django.conf import settings
-from urllib2 import urlopen
-from urllib import urlencode
-import json
 
-URL = 'https://api.cdn77.com/v2.0/data/purge'
-URL_ALL = 'https://api.cdn77.com/v2.0/data/purge-all'
+from pmaweb.httpclient import post
+from pmaweb.jobs import enqueue
+
+PURGE = '/data/purge'
+PURGE_ALL = '/data/purge-all'
+
+# Maximal number of URLs purged by single API request
+MAX_URLS = 2000
 
 
 def perform(url, data):
     """Perform CDN POST request"""
-    handle = urlopen(url, urlencode(data))
-    response = handle.read()
-    decoded = json.loads(response)
+    decoded = post(url, data).json()
     if decoded['status'] != 'ok':
         if 'errors' in decoded:
             raise Exception(decoded['errors'])
@@ -41,41 +46,58 @@ def perform(url, data):
     return decoded
 
 
-def purge_cdn(*pages):
-    """Purges page on CDN"""
-    if not settings.CDN_PASSWORD:
-        return
-    data = [
+def get_credentials(cdn_id):
+    return [
         ('login', settings.CDN_LOGIN),
         ('passwd', settings.CDN_PASSWORD),
-        ('cdn_id', settings.CDN_ID),
+        ('cdn_id', cdn_id),
     ]
-    for page in pages:
-        data.append(('url[]', page))
-    return perform(URL, data)
+
+
+def purge(cdn_id, pages):
+    """Purges pages on CDN, splitting them to allowed request size"""
+    for start in range(0, len(pages), MAX_URLS):
+        data = get_credentials(cdn_id)
+        for page in pages[start:start + MAX_URLS]:
+            data.append(('url[]', page))
+        perform(settings.CDN_API_URL + PURGE, data)
+
+
+def purge_all(cdn_id, pages=()):
+    """Purges all pages on CDN"""
+    perform(settings.CDN_API_URL + PURGE_ALL, get_credentials(cdn_id))
+
+
+def purge_cdn(*pages):
+    """Purges page on CDN"""
+    if not settings.CDN_PASSWORD or not pages:
+        return
+    enqueue('purge', settings.CDN_ID, *pages)
 
 
 def purge_files_cdn(*pages):
     """Purges page on CDN"""
-    if not settings.CDN_PASSWORD:
+    if not settings.CDN_PASSWORD or not pages:
         return
-    data = [
-        ('login', settings.CDN_LOGIN),
-        ('passwd', settings.CDN_PASSWORD),
-        ('cdn_id', settings.FILES_CDN_ID),
-    ]
-    for page in pages:
-        data.append(('url[]', page))
-    return perform(URL, data)
+    enqueue('purge', settings.FILES_CDN_ID, *pages)
+
+
+def purge_tagged_cdn(*tags):
+    """Purges pages depending on release data with given tags
+
+    Dependencies of pages are recorded only with the job queue, all pages
+    are purged without it.
+    """
+    if not settings.CDN_PASSWORD or not tags:
+        return
+    if settings.JOB_QUEUE is None:
+        purge_all_cdn()
+        return
+    enqueue('purge-tags', settings.CDN_ID, *tags)
 
 
 def purge_all_cdn():
     """Purges all pages on CDN"""
     if not settings.CDN_PASSWORD:
         return
-    data = [
-        ('login', settings.CDN_LOGIN),
-        ('passwd', settings.CDN_PASSWORD),
-        ('cdn_id', settings.CDN_ID),
-    ]
-    return perform(URL_ALL, data)
+    enqueue('purge-all', settings.CDN_ID)
@@ -0,0 +1,152 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Conditional GET support based on content generations
+
+Validators of a page are derived from generations of the content it
+depends on and the current year shown in the footer, so requests from
+clients which already have current version are answered with 304 before
+the view renders anything.
+"""
+import calendar
+import hashlib
+import time
+
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils import timezone
+from django.utils.http import http_date
+
+from pmaweb.snapshot import (
+    Snapshot, get_generation, GENERATION_KEY, NEWS_GENERATION,
+    RELEASES_GENERATION, SECURITY_GENERATION,
+)
+
+# Templates might change on restart, so validators depend on it as well
+STARTED = int(time.time())
+
+# Generations routes depend on, other routes depend on all content
+DEPENDENCIES = {
+    'feed-news': (NEWS_GENERATION,),
+    'feed-files': (RELEASES_GENERATION,),
+    'feed-security': (SECURITY_GENERATION,),
+    'sitemap': (),
+}
+
+# Generations sitemap sections depend on
+SITEMAP_SECTION = 'django.contrib.sitemaps.views.sitemap'
+SECTIONS = {
+    'news': (NEWS_GENERATION,),
+    'security': (SECURITY_GENERATION,),
+    'releases': (RELEASES_GENERATION,),
+    'pages': (),
+    'daily': (),
+}
+
+# Routes listing news posts, scheduled posts show up without any change
+SCHEDULED = frozenset(('home', 'news', 'news-page', 'feed-news'))
+
+
+def get_published():
+    """Returns time when latest news post was published"""
+    # Imported here to avoid circular import through models
+    from news.models import Post
+    date = Post.objects.filter(
+        date__lt=timezone.now()
+    ).order_by('-date').values_list('date', flat=True).first()
+    if date is None:
+        return 0
+    return calendar.timegm(date.utctimetuple())
+
+
+def get_next_post_date():
+    from pmaweb.context_processors import get_next_post_date
+    return get_next_post_date()
+
+
+def get_year():
+    """Returns current year and time when it started"""
+    from pmaweb import context_processors
+    year = context_processors.get_current_year()
+    return year, int(time.mktime((year, 1, 1, 0, 0, 0, 0, 1, -1)))
+
+
+PUBLISHED = Snapshot(
+    {'published': get_published},
+    expires=get_next_post_date,
+    key=NEWS_GENERATION,
+)
+
+
+def get_dependencies(match):
+    """Returns generations of resolved URL and whether it lists news"""
+    if match.url_name == SITEMAP_SECTION:
+        section = match.kwargs.get('section')
+        return SECTIONS.get(section, (GENERATION_KEY,)), section == 'news'
+    return (
+        DEPENDENCIES.get(match.url_name, (GENERATION_KEY,)),
+        match.url_name in SCHEDULED
+    )
+
+
+def get_validators(match):
+    """Returns ETag and Last-Modified time for resolved URL"""
+    keys, scheduled = get_dependencies(match)
+    generations = tuple(get_generation(key) for key in keys)
+    published = PUBLISHED.get('published') if scheduled else 0
+    year, started = get_year()
+    changed = max(
+        [STARTED, published, started] +
+        [generation[0] for generation in generations]
+    )
+    digest = hashlib.sha1(
+        repr((STARTED, published, year, generations)).encode('utf-8')
+    ).hexdigest()
+    return '"{0}"'.format(digest), changed
+
+
+class ConditionalMiddleware(MiddlewareMixin):
+    """Answers conditional requests before the view is called"""
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        match = request.resolver_match
+        if match is None or not match.url_name or match.namespace:
+            return None
+        etag, changed = get_validators(match)
+        request.validators = (etag, changed)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=changed
+        )
+        if response is not None:
+            self.set_validators(response, etag, changed)
+        return response
+
+    def set_validators(self, response, etag, changed):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(changed)
+
+    def process_response(self, request, response):
+        validators = getattr(request, 'validators', None)
+        if (validators is not None and response.status_code == 200 and
+                not response.has_header('ETag')):
+            self.set_validators(response, *validators)
+        return response
@@ -19,11 +19,13 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-from files.models import Release, Theme, get_current_releases
+from files.catalog import get_catalog
+from files.models import Theme
 from news.models import Post, Planet
 from translations.models import Translation
 from security.models import PMASA
 from demo.models import Demo
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.utils import timezone
 import datetime
@@ -32,26 +34,89 @@ from data.menu import MENU
 from data.screenshots import SCREENSHOTS
 from data.themes import CSSVERSIONS
 from data.awards import AWARDS
+from pmaweb.dependencies import LATEST, BETA, CURRENT, ALL, SNAPSHOTS
+from pmaweb.snapshot import Snapshot, RELEASES_GENERATION
+
+
+def get_short_news():
+    return list(Post.objects.filter(date__lt=timezone.now())[:5])
+
+
+def get_next_post_date():
+    # Scheduled posts become visible without any save
+    return Post.objects.filter(
+        date__gte=timezone.now()
+    ).order_by('date').values_list('date', flat=True).first()
+
+
+def get_pmasa_year():
+    pmasas = BASIC.get('pmasas')
+    if pmasas:
+        return pmasas[0].year
+    return None
+
+
+BASIC = Snapshot(
+    {
+        'short_news': get_short_news,
+        'short_planet': lambda: list(Planet.objects.all()[:5]),
+        'themes': lambda: list(Theme.objects.filter(show=True)),
+        'pmasas': lambda: list(PMASA.objects.filter(draft=False)),
+        'pmasa_year': get_pmasa_year,
+        'translations': lambda: list(Translation.objects.all()),
+        'demo_stable': lambda: list(
+            Demo.objects.exclude(name__startswith='master')
+        ),
+        'demo_devel': lambda: list(
+            Demo.objects.filter(name__startswith='master')
+        ),
+    },
+    expires=get_next_post_date,
+)
+
+RELEASES = Snapshot({
+    'latest_release': lambda: get_catalog().latest,
+    'beta_release': lambda: get_catalog().beta,
+    'releases': lambda: get_catalog().get_current_releases(),
+    'all_releases': lambda: get_catalog().listed,
+    'all_snapshots': lambda: get_catalog().snapshots,
+}, key=RELEASES_GENERATION, tags={
+    'latest_release': LATEST,
+    'beta_release': BETA,
+    'releases': CURRENT,
+    'all_releases': ALL,
+    'all_snapshots': SNAPSHOTS,
+})
+
+
+def get_context_groups(request):
+    """Returns context groups requested by the view, None means all"""
+    return getattr(request, 'context_groups', None)
+
+
+def get_current_year():
+    return datetime.datetime.now().year
 
 
 def basic(request):
-    return {
-        'current_year': datetime.datetime.now().year,
-        'short_news': Post.objects.filter(date__lt=timezone.now())[:5],
-        'short_planet': Planet.objects.all()[:5],
+    result = {
+        'current_year': get_current_year(),
         'screenshots': SCREENSHOTS,
-        'themes': Theme.objects.filter(show=True),
         'themecssversions': CSSVERSIONS,
         'awards': AWARDS,
-        'pmasas': PMASA.objects.filter(draft=False),
-        'pmasa_year': PMASA.objects.filter(draft=False).order_by('-year').values_list('year', flat=True)[0],
-        'translations': Translation.objects.all(),
-        'demo_stable': Demo.objects.exclude(name__startswith='master'),
-        'demo_devel': Demo.objects.filter(name__startswith='master'),
+        'edge_includes': settings.EDGE_INCLUDES,
     }
+    groups = get_context_groups(request)
+    if groups is None or 'basic' in groups:
+        result.update(BASIC.context())
+    return result
 
 
 def menu(request):
+    groups = get_context_groups(request)
+    if groups is not None and 'menu' not in groups:
+        return {}
+
     result = []
 
     for name, title in MENU:
@@ -77,19 +142,7 @@ def menu(request):
 
 
 def releases(request=None):
-
-    latest = Release.objects.filter(stable=True)[0]
-    if Release.objects.filter(stable=False, snapshot=False).exists():
-        beta = Release.objects.filter(stable=False, snapshot=False)[0]
-        if beta.version_num < latest.version_num:
-            beta = None
-    else:
-        beta = None
-
-    return {
-        'latest_release': latest,
-        'beta_release': beta,
-        'releases': get_current_releases(),
-        'all_releases': Release.objects.filter(snapshot=False),
-        'all_snapshots': Release.objects.filter(snapshot=True),
-    }
+    groups = get_context_groups(request)
+    if groups is not None and 'releases' not in groups:
+        return {}
+    return RELEASES.context()
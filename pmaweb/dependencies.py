@@ -0,0 +1,112 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Tracking of release data pages depend on
+
+While a page is rendered, the release data it uses are recorded as tags.
+Tags of each URL are stored in the job queue database, so that saving
+a release purges only URLs which show it instead of the whole CDN.
+"""
+import threading
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from pmaweb.jobs import connect
+
+# Tags of release data
+LATEST = 'latest'
+BETA = 'beta'
+CURRENT = 'current'
+ALL = 'all'
+SNAPSHOTS = 'snapshots'
+
+STATE = threading.local()
+
+# Tags already stored by this process
+KNOWN = {}
+
+
+def release_tag(version):
+    return 'release:{0}'.format(version)
+
+
+def record(*tags):
+    """Records tags used by currently rendered page"""
+    current = getattr(STATE, 'tags', None)
+    if current is not None:
+        current.update(tags)
+
+
+def store_dependencies(url, tags, path=None):
+    """Stores tags URL depends on, replacing previous ones"""
+    tags = frozenset(tags)
+    if KNOWN.get(url) == tags:
+        return
+    handle = connect(path)
+    try:
+        with handle:
+            handle.execute('DELETE FROM dependency WHERE url = ?', (url,))
+            handle.executemany(
+                'INSERT INTO dependency (url, tag) VALUES (?, ?)',
+                [(url, tag) for tag in sorted(tags)]
+            )
+    finally:
+        handle.close()
+    KNOWN[url] = tags
+
+
+def get_urls(tags, path=None):
+    """Returns URLs depending on any of the tags"""
+    handle = connect(path)
+    try:
+        return sorted(set(
+            row[0] for tag in tags for row in handle.execute(
+                'SELECT url FROM dependency WHERE tag = ?', (tag,)
+            )
+        ))
+    finally:
+        handle.close()
+
+
+def purge_tags(cdn_id, tags):
+    """Purges URLs depending on the tags, used by the job worker"""
+    # Imported here to avoid circular import
+    from pmaweb.cdn import purge
+    urls = get_urls(tags)
+    if urls:
+        purge(cdn_id, urls)
+
+
+class DependencyMiddleware(MiddlewareMixin):
+    """Records tags of rendered pages, active with job queue only"""
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.JOB_QUEUE is None or request.method != 'GET':
+            return
+        STATE.tags = request.dependencies = set()
+
+    def process_response(self, request, response):
+        if not hasattr(request, 'dependencies'):
+            return response
+        STATE.tags = None
+        if response.status_code == 200:
+            store_dependencies(request.get_full_path(), request.dependencies)
+        return response
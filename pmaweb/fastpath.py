@@ -0,0 +1,162 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Fast path for version check endpoints
+
+Every phpMyAdmin installation polls these URLs, so they are answered
+directly in WSGI from prerendered and precompressed responses without
+going through Django.
+"""
+from hashlib import sha1
+import time
+
+from django.db import close_old_connections
+
+from pmaweb.artifacts import ARTIFACTS, PATHS as ARTIFACT_PATHS
+from pmaweb.artifacts import render_artifacts
+from pmaweb.output import gzip_compress
+from pmaweb.snapshot import Snapshot, RELEASES_GENERATION
+
+# Served artifacts
+NAMES = ('version.txt', 'version.js', 'version.json')
+
+# Served paths and names of their responses
+PATHS = {
+    '/' + path: name
+    for path, name in ARTIFACT_PATHS.items() if name in NAMES
+}
+
+# How often in seconds to check whether releases changed
+CHECK_INTERVAL = 1
+
+
+class Entry(object):
+    """Prerendered response with its compressed variant"""
+    __slots__ = ('content_type', 'body', 'etag', 'gzip_body', 'gzip_etag')
+
+    def __init__(self, content_type, body):
+        self.content_type = content_type
+        self.body = body
+        digest = sha1(body).hexdigest()
+        self.etag = '"{0}"'.format(digest)
+        self.gzip_body = gzip_compress(body)
+        self.gzip_etag = '"{0}-gzip"'.format(digest)
+
+
+def build_responses():
+    try:
+        return {
+            name: Entry(ARTIFACTS[name][1], content)
+            for name, content in render_artifacts(NAMES).items()
+        }
+    finally:
+        # Not running within Django request, so clean up the connection
+        close_old_connections()
+
+
+RESPONSES = Snapshot({'responses': build_responses}, key=RELEASES_GENERATION)
+
+
+def get_quality(params):
+    """Returns q value from parameters of Accept-Encoding item"""
+    for param in params:
+        name, dummy, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepts_gzip(environ):
+    """Checks whether client accepts gzip, honoring q values"""
+    encodings = {}
+    for item in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        params = item.split(';')
+        name = params[0].strip().lower()
+        if name:
+            encodings[name] = get_quality(params[1:])
+    if 'gzip' in encodings:
+        return encodings['gzip'] > 0
+    return encodings.get('*', 0) > 0
+
+
+def etag_matches(environ, etag):
+    header = environ.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = [item.strip() for item in header.split(',')]
+    if '*' in tags:
+        return True
+    # Weak comparison is used for If-None-Match
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+class FastPathApplication(object):
+    """WSGI application serving version checks, passing others to Django
+
+    The generation of releases is checked at most once per interval, so
+    most of the requests do not touch even the cache.
+    """
+    def __init__(self, application, interval=CHECK_INTERVAL):
+        self.application = application
+        self.interval = interval
+        self.current = (0, None)
+
+    def get_responses(self):
+        checked, responses = self.current
+        now = time.time()
+        if responses is None or now - checked >= self.interval:
+            responses = RESPONSES.get('responses')
+            self.current = (now, responses)
+        return responses
+
+    def __call__(self, environ, start_response):
+        name = PATHS.get(environ.get('PATH_INFO'))
+        method = environ.get('REQUEST_METHOD')
+        if name is None or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+
+        entry = self.get_responses()[name]
+        if accepts_gzip(environ):
+            etag = entry.gzip_etag
+            body = entry.gzip_body
+        else:
+            etag = entry.etag
+            body = entry.body
+        headers = [
+            ('ETag', etag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if etag_matches(environ, etag):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.extend([
+            ('Content-Type', entry.content_type),
+            ('Content-Length', str(len(body))),
+        ])
+        if body is entry.gzip_body:
+            headers.append(('Content-Encoding', 'gzip'))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        return [body]
@@ -0,0 +1,243 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Shared HTTP client for outbound requests
+
+Connections are kept open and reused for further requests to the same
+host, so bursts of API calls do not pay for TCP and TLS handshake each
+time. Number of concurrent connections to a host is limited.
+"""
+import httplib
+import json
+import socket
+import threading
+import time
+from urllib import urlencode
+from urlparse import urlsplit, urljoin
+
+from django.conf import settings
+
+USER_AGENT = 'phpMyAdmin-website'
+
+# Redirects followed for GET requests
+MAX_REDIRECTS = 5
+REDIRECTS = frozenset((301, 302, 303, 307, 308))
+
+# Methods which can be safely repeated after the request was sent
+IDEMPOTENT = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+POOLS = {}
+POOLS_LOCK = threading.Lock()
+
+STATS = {}
+STATS_LOCK = threading.Lock()
+
+
+class HTTPError(IOError):
+    """Response with error status"""
+    def __init__(self, url, response):
+        super(HTTPError, self).__init__(
+            'HTTP Error {0}: {1}'.format(response.status, response.reason)
+        )
+        self.url = url
+        self.code = response.status
+        self.response = response
+        self.content = response.content
+
+
+class Response(object):
+    """Completely read response"""
+    __slots__ = ('url', 'status', 'reason', 'headers', 'content')
+
+    def __init__(self, url, response):
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = {
+            name.lower(): value for name, value in response.getheaders()
+        }
+        self.content = response.read()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HostPool(object):
+    """Idle connections to single host"""
+    def __init__(self, scheme, netloc):
+        if scheme == 'https':
+            self.connection_class = httplib.HTTPSConnection
+        else:
+            self.connection_class = httplib.HTTPConnection
+        self.netloc = netloc
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(settings.HTTP_MAX_CONNECTIONS)
+
+    def get(self, timeout):
+        """Returns connection and whether it was used before"""
+        with self.lock:
+            if self.idle:
+                connection = self.idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        return self.connection_class(self.netloc, timeout=timeout), False
+
+    def put(self, connection):
+        with self.lock:
+            self.idle.append(connection)
+
+    def close(self):
+        with self.lock:
+            for connection in self.idle:
+                connection.close()
+            del self.idle[:]
+
+    def perform(self, method, url, path, body, headers, timeout):
+        """Returns response and whether its connection was reused"""
+        with self.slots:
+            for attempt in range(2):
+                connection, reused = self.get(timeout)
+                sent = False
+                try:
+                    connection.request(method, path, body, headers)
+                    sent = True
+                    handle = connection.getresponse()
+                    response = Response(url, handle)
+                except socket.timeout:
+                    connection.close()
+                    raise
+                except (httplib.HTTPException, socket.error) as error:
+                    connection.close()
+                    # Server might have closed the idle connection meanwhile,
+                    # repeat only requests which could not have been
+                    # performed yet
+                    if reused and attempt == 0 and (
+                            not sent or method in IDEMPOTENT):
+                        continue
+                    if isinstance(error, httplib.HTTPException):
+                        raise IOError(
+                            'HTTP request failed: {0!r}'.format(error)
+                        )
+                    raise
+                if handle.will_close:
+                    connection.close()
+                else:
+                    self.put(connection)
+                return response, reused
+
+
+def get_pool(scheme, netloc):
+    key = (scheme, netloc)
+    with POOLS_LOCK:
+        if key not in POOLS:
+            POOLS[key] = HostPool(scheme, netloc)
+        return POOLS[key]
+
+
+def close_pools():
+    """Closes all idle connections"""
+    with POOLS_LOCK:
+        for pool in POOLS.values():
+            pool.close()
+        POOLS.clear()
+
+
+def record_request(host, elapsed, reused=False, error=False):
+    with STATS_LOCK:
+        stats = STATS.setdefault(host, {
+            'requests': 0,
+            'connections': 0,
+            'errors': 0,
+            'time': 0.0,
+        })
+        stats['requests'] += 1
+        stats['time'] += elapsed
+        if error:
+            stats['errors'] += 1
+        elif not reused:
+            stats['connections'] += 1
+
+
+def get_http_stats():
+    """Returns copy of per host statistics"""
+    with STATS_LOCK:
+        return {host: dict(stats) for host, stats in STATS.items()}
+
+
+def reset_http_stats():
+    with STATS_LOCK:
+        STATS.clear()
+
+
+def request(method, url, data=None, headers=None, timeout=None):
+    """Performs HTTP request, raises HTTPError on error status
+
+    The data can be either encoded body or sequence of parameters which are
+    sent as form.
+    """
+    if timeout is None:
+        timeout = settings.HTTP_TIMEOUT
+    headers = dict(headers or {})
+    headers.setdefault('User-Agent', USER_AGENT)
+    if data is not None and not isinstance(data, basestring):
+        data = urlencode(data)
+        headers.setdefault(
+            'Content-Type', 'application/x-www-form-urlencoded'
+        )
+    for redirect in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = '{0}?{1}'.format(path, parts.query)
+        pool = get_pool(parts.scheme, parts.netloc)
+        start = time.time()
+        try:
+            response, reused = pool.perform(
+                method, url, path, data, headers, timeout
+            )
+        except IOError:
+            record_request(parts.netloc, time.time() - start, error=True)
+            raise
+        record_request(parts.netloc, time.time() - start, reused)
+        if (method != 'GET' or response.status not in REDIRECTS or
+                'location' not in response.headers):
+            break
+        url = urljoin(url, response.headers['location'])
+        if urlsplit(url).netloc != parts.netloc:
+            # Do not leak credentials to other hosts
+            headers = {
+                name: value for name, value in headers.items()
+                if name.lower() != 'authorization'
+            }
+    if response.status >= 400:
+        raise HTTPError(url, response)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, data, **kwargs):
+    return request('POST', url, data, **kwargs)
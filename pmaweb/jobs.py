@@ -0,0 +1,198 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Durable queue of outbound requests
+
+CDN purges and Docker Hub triggers are stored in SQLite database once the
+transaction is committed and performed later by the process_jobs command.
+Jobs of the same kind and target are merged into single request and
+failed requests are retried with increasing delay.
+
+Without JOB_QUEUE configured jobs are performed immediately.
+"""
+from functools import partial
+import logging
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+LOGGER = logging.getLogger('pmaweb.jobs')
+
+# Functions performing the jobs, called with target and list of values
+HANDLERS = {
+    'purge': 'pmaweb.cdn.purge',
+    'purge-all': 'pmaweb.cdn.purge_all',
+    'dockerhub': 'pmaweb.dockerhub.trigger',
+    'purge-tags': 'pmaweb.dependencies.purge_tags',
+}
+
+# Jobs which make other ones with the same target redundant
+COVERS = {
+    'purge-all': ('purge', 'purge-tags'),
+}
+
+# Seconds to wait for more jobs to merge them into single request
+WINDOW = 5
+
+# Delays of retries in seconds, the job is given up after the last one
+BACKOFF = (10, 60, 300, 1800, 7200)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS job (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        target TEXT NOT NULL,
+        value TEXT NOT NULL,
+        created REAL NOT NULL,
+        due REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS job_due ON job (due)',
+    """
+    CREATE TABLE IF NOT EXISTS dependency (
+        url TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (url, tag)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS dependency_tag ON dependency (tag)',
+)
+
+
+def connect(path=None):
+    handle = sqlite3.connect(path or settings.JOB_QUEUE, timeout=60)
+    handle.execute('PRAGMA journal_mode=WAL')
+    for statement in SCHEMA:
+        handle.execute(statement)
+    return handle
+
+
+def perform(kind, target, values):
+    import_string(HANDLERS[kind])(target, values)
+
+
+def store_jobs(jobs, path=None):
+    """Writes jobs into the queue"""
+    now = time.time()
+    handle = connect(path)
+    try:
+        with handle:
+            handle.executemany(
+                'INSERT INTO job (kind, target, value, created, due) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [job + (now, now) for job in jobs]
+            )
+    finally:
+        handle.close()
+
+
+def enqueue(kind, target, *values):
+    """Queues job to be performed once current transaction is committed"""
+    if settings.JOB_QUEUE is None:
+        perform(kind, target, list(values))
+        return
+    jobs = [(kind, target, value) for value in values or ('',)]
+    transaction.on_commit(partial(store_jobs, jobs))
+
+
+def get_groups(rows, now, window):
+    """Groups due jobs by kind and target
+
+    Group is ready once its oldest job is older than the window or when it
+    is being retried.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault((row[1], row[2]), []).append(row)
+    result = []
+    for key, group in sorted(groups.items(), key=lambda item: item[1][0][0]):
+        if group[0][4] > now - window and not group[0][5]:
+            continue
+        result.append((key, group))
+    # Drop jobs made redundant by other jobs
+    covered = set(
+        (covered_kind, target)
+        for (kind, target), group in result if kind in COVERS
+        for covered_kind in COVERS[kind]
+    )
+    ready = [(key, group) for key, group in result if key not in covered]
+    redundant = [
+        row[0] for key, group in result if key in covered for row in group
+    ]
+    return ready, redundant
+
+
+def process_jobs(path=None, window=WINDOW):
+    """Performs due jobs, returns number of performed and failed groups"""
+    now = time.time()
+    handle = connect(path)
+    try:
+        rows = handle.execute(
+            'SELECT id, kind, target, value, created, attempts FROM job '
+            'WHERE due <= ? ORDER BY id',
+            (now,)
+        ).fetchall()
+        ready, redundant = get_groups(rows, now, window)
+        with handle:
+            handle.executemany(
+                'DELETE FROM job WHERE id = ?', [(pk,) for pk in redundant]
+            )
+        done = failed = 0
+        for (kind, target), group in ready:
+            values = []
+            for row in group:
+                if row[3] not in values:
+                    values.append(row[3])
+            ids = [(row[0],) for row in group]
+            try:
+                perform(kind, target, values)
+            except Exception as error:
+                failed += 1
+                attempts = max(row[5] for row in group)
+                if attempts < len(BACKOFF):
+                    due = time.time() + BACKOFF[attempts]
+                    LOGGER.warning(
+                        'Job %s %s failed, retrying: %s', kind, target, error
+                    )
+                else:
+                    due = None
+                    LOGGER.error(
+                        'Job %s %s failed, giving up: %s', kind, target, error
+                    )
+                with handle:
+                    handle.executemany(
+                        'UPDATE job SET attempts = ?, due = ?, error = ? '
+                        'WHERE id = ?',
+                        [(attempts + 1, due, str(error), pk) for pk, in ids]
+                    )
+            else:
+                done += 1
+                with handle:
+                    handle.executemany('DELETE FROM job WHERE id = ?', ids)
+        return done, failed
+    finally:
+        handle.close()
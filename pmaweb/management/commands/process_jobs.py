@@ -0,0 +1,69 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pmaweb.jobs import process_jobs, WINDOW
+
+
+class Command(BaseCommand):
+    help = 'Performs queued CDN purges and Docker Hub triggers'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--queue',
+            default=settings.JOB_QUEUE,
+            help='Job queue database',
+        )
+        parser.add_argument(
+            '--window',
+            type=float,
+            default=WINDOW,
+            help='Seconds to wait for more jobs to merge',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep processing the queue',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            help='Seconds between checks of the queue when looping',
+        )
+
+    def handle(self, *args, **options):
+        if not options['queue']:
+            raise CommandError('No job queue configured')
+        while True:
+            done, failed = process_jobs(options['queue'], options['window'])
+            if done or failed:
+                self.stdout.write(
+                    'Performed {0} jobs, {1} failed'.format(done, failed)
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
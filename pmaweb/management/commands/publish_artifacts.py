@@ -0,0 +1,44 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pmaweb.artifacts import publish_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Publishes machine readable files'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--output',
+            default=settings.ARTIFACTS_PATH,
+            help='Where to store published files',
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('No output directory configured')
+        for path in publish_artifacts(options['output']):
+            self.stdout.write('Published {0}'.format(path))
@@ -0,0 +1,95 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pmaweb.render import Renderer, get_site_urls, publish
+from pmaweb.renderqueue import (
+    pop_render_queue, finish_render_queue, FULL_RENDER
+)
+
+
+class Command(BaseCommand):
+    help = 'Renders public pages into static files'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--output',
+            default=settings.RENDER_PATH,
+            help='Where to store rendered site',
+        )
+        parser.add_argument(
+            '--host',
+            default=settings.RENDER_HOST,
+            help='Host name used for rendering',
+        )
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Render only pages from the render queue',
+        )
+
+    def render_urls(self, renderer, urls, remove=False):
+        rendered = skipped = 0
+        for url in urls:
+            try:
+                path = renderer.render(url)
+            except Exception as error:
+                self.stderr.write('Failed {0}: {1}'.format(url, error))
+                path = None
+            else:
+                if path is None:
+                    self.stderr.write('Skipped {0}'.format(url))
+                    if remove:
+                        renderer.remove(url)
+            if path is None:
+                skipped += 1
+            else:
+                rendered += 1
+        self.stdout.write(
+            'Rendered {0} pages, skipped {1}'.format(rendered, skipped)
+        )
+
+    def handle(self, *args, **options):
+        target = os.path.abspath(options['output'])
+
+        if options['pending']:
+            urls = pop_render_queue()
+            if not urls:
+                return
+            if FULL_RENDER not in urls and os.path.exists(target):
+                renderer = Renderer(os.path.realpath(target), options['host'])
+                self.render_urls(renderer, urls, remove=True)
+                finish_render_queue()
+                return
+
+        build = '{0}.{1}'.format(target, int(time.time() * 1000))
+        renderer = Renderer(build, options['host'])
+        self.render_urls(renderer, get_site_urls())
+        renderer.render_not_found()
+        publish(build, target)
+        if options['pending']:
+            finish_render_queue()
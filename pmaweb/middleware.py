@@ -0,0 +1,127 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Per route database query instrumentation"""
+from collections import Counter
+from itertools import islice
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+LOGGER = logging.getLogger('pmaweb.queries')
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b[0-9]+\b")
+
+STATS = {}
+STATS_LOCK = threading.Lock()
+
+
+def fingerprint(sql):
+    """Returns SQL with literals replaced to group same queries"""
+    return LITERAL_RE.sub('?', sql)
+
+
+def get_route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name
+
+
+def record_queries(name, queries):
+    """Records queries issued by single request to given route"""
+    fingerprints = Counter(fingerprint(query['sql']) for query in queries)
+    duplicates = Counter({
+        sql: count - 1 for sql, count in fingerprints.items() if count > 1
+    })
+    result = {
+        'queries': len(queries),
+        'time': sum(float(query['time']) for query in queries),
+        'duplicates': sum(duplicates.values()),
+    }
+    with STATS_LOCK:
+        stats = STATS.setdefault(name, {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'time': 0.0,
+            'duplicates': Counter(),
+        })
+        stats['requests'] += 1
+        stats['queries'] += result['queries']
+        stats['max_queries'] = max(stats['max_queries'], result['queries'])
+        stats['time'] += result['time']
+        stats['duplicates'].update(duplicates)
+    return result
+
+
+def get_query_stats():
+    """Returns copy of per route statistics"""
+    with STATS_LOCK:
+        return {
+            name: dict(stats, duplicates=Counter(stats['duplicates']))
+            for name, stats in STATS.items()
+        }
+
+
+def reset_query_stats():
+    with STATS_LOCK:
+        STATS.clear()
+
+
+class QueryCountMiddleware(MiddlewareMixin):
+    """Counts queries per route, adds them to response headers in DEBUG
+
+    Active in DEBUG or when QUERY_STATS setting is enabled.
+    """
+    def is_enabled(self):
+        return settings.DEBUG or getattr(settings, 'QUERY_STATS', False)
+
+    def process_request(self, request):
+        if not self.is_enabled():
+            return
+        request.query_state = (
+            connection.force_debug_cursor,
+            len(connection.queries_log),
+        )
+        connection.force_debug_cursor = True
+
+    def process_response(self, request, response):
+        if not hasattr(request, 'query_state'):
+            return response
+        force_debug_cursor, start = request.query_state
+        connection.force_debug_cursor = force_debug_cursor
+        queries = list(islice(connection.queries_log, start, None))
+        name = get_route_name(request)
+        result = record_queries(name, queries)
+        LOGGER.debug(
+            '%s: %d queries, %.3f s, %d duplicates',
+            name, result['queries'], result['time'], result['duplicates']
+        )
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(result['queries'])
+            response['X-Query-Time'] = '{0:.3f}'.format(result['time'])
+            response['X-Query-Duplicates'] = str(result['duplicates'])
+        return response
@@ -0,0 +1,71 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Writing of prerendered output with compressed variants"""
+from io import BytesIO
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Suffixes of compressed variants
+COMPRESSED = ('.gz', '.br') if brotli else ('.gz',)
+
+
+def gzip_compress(content, name=''):
+    """Returns gzip compressed content
+
+    Fixed mtime makes the output reproducible.
+    """
+    handle = BytesIO()
+    compressed = gzip.GzipFile(name, 'wb', 9, handle, 0)
+    compressed.write(content)
+    compressed.close()
+    return handle.getvalue()
+
+
+def write_file(filename, content):
+    """Atomically writes file and its compressed variants
+
+    The brotli variant is written only when the brotli module is installed.
+    """
+    directory = os.path.dirname(filename)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    variants = [
+        (filename, content),
+        (
+            '{0}.gz'.format(filename),
+            gzip_compress(content, os.path.basename(filename))
+        ),
+    ]
+    if brotli is not None:
+        variants.append(
+            ('{0}.br'.format(filename), brotli.compress(content))
+        )
+    temp = '{0}.tmp'.format(filename)
+    for name, data in variants:
+        with open(temp, 'wb') as handle:
+            handle.write(data)
+        os.rename(temp, name)
@@ -0,0 +1,236 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Disk cache of GitHub API responses
+
+Commits are addressed by their SHA and never change, so they are kept
+forever. Trees are fresh for a while, afterwards the stale copy is served
+while it is revalidated in the background using the stored ETag, which
+does not count against the API rate limit when unchanged.
+
+Concurrent misses of the same key wait for single upstream request, both
+within the process and across processes sharing the cache.
+"""
+from contextlib import contextmanager
+import base64
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from pmaweb.httpclient import get
+
+LOGGER = logging.getLogger('pmaweb.proxycache')
+
+# Seconds for which cached responses are fresh, None means forever
+TTL = {
+    'commits': None,
+    'trees': 600,
+}
+
+# Requests in progress and background revalidations, keyed by path
+FLIGHTS = {}
+REVALIDATIONS = {}
+LOCK = threading.Lock()
+
+
+class Entry(object):
+    """Cached upstream response"""
+    __slots__ = ('content', 'etag', 'fetched')
+
+    def __init__(self, content, etag, fetched):
+        self.content = content
+        self.etag = etag
+        self.fetched = fetched
+
+    def is_fresh(self, ttl):
+        return ttl is None or self.fetched + ttl > time.time()
+
+
+class Flight(object):
+    """Upstream request shared by concurrent callers"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def get_headers():
+    headers = {}
+    if settings.GITHUB_USER and settings.GITHUB_TOKEN:
+        credentials = base64.b64encode(
+            '{0}:{1}'.format(settings.GITHUB_USER, settings.GITHUB_TOKEN)
+        )
+        headers['Authorization'] = 'Basic {0}'.format(credentials)
+    return headers
+
+
+def get_path(kind, name):
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(settings.GITHUB_CACHE, kind, digest[:2], digest)
+
+
+def read_entry(path):
+    try:
+        with open(path, 'rb') as handle:
+            data = json.loads(handle.read().decode('utf-8'))
+    except (IOError, ValueError):
+        return None
+    return Entry(
+        data['content'].encode('utf-8'), data['etag'], data['fetched']
+    )
+
+
+def write_entry(path, entry):
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    data = json.dumps({
+        'content': entry.content.decode('utf-8'),
+        'etag': entry.etag,
+        'fetched': entry.fetched,
+    })
+    temp = '{0}.{1}.{2}.tmp'.format(
+        path, os.getpid(), threading.current_thread().ident
+    )
+    with open(temp, 'wb') as handle:
+        handle.write(data.encode('utf-8'))
+    os.rename(temp, path)
+
+
+def acquire(path, blocking=True):
+    """Locks the path, returns None if it is locked by other process
+
+    The lock is released by closing the returned file.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    operation = fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    handle = open('{0}.lock'.format(path), 'a')
+    try:
+        fcntl.flock(handle, operation)
+    except IOError as error:
+        handle.close()
+        if error.errno in (errno.EAGAIN, errno.EACCES):
+            return None
+        raise
+    return handle
+
+
+@contextmanager
+def locked(path):
+    """Serializes upstream requests for the path across processes"""
+    handle = acquire(path)
+    try:
+        yield
+    finally:
+        handle.close()
+
+
+def fetch(url, previous=None):
+    """Fetches response, revalidating previous one if available"""
+    headers = get_headers()
+    if previous is not None and previous.etag:
+        headers['If-None-Match'] = previous.etag
+    response = get(url, headers=headers)
+    if response.status == 304 and previous is not None:
+        return Entry(previous.content, previous.etag, time.time())
+    return Entry(response.content, response.headers.get('etag'), time.time())
+
+
+def update(path, url, ttl):
+    """Fetches entry unless other process has stored fresh one"""
+    with locked(path):
+        entry = read_entry(path)
+        if entry is not None and entry.is_fresh(ttl):
+            return entry
+        entry = fetch(url, entry)
+        write_entry(path, entry)
+        return entry
+
+
+def single_flight(path, function):
+    """Calls function, concurrent calls for the path wait for its result"""
+    with LOCK:
+        flight = FLIGHTS.get(path)
+        leader = flight is None
+        if leader:
+            flight = FLIGHTS[path] = Flight()
+    if not leader:
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = function()
+        return flight.result
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with LOCK:
+            del FLIGHTS[path]
+        flight.event.set()
+
+
+def revalidate(path, url, ttl):
+    try:
+        single_flight(path, lambda: update(path, url, ttl))
+    except IOError as error:
+        LOGGER.warning('Failed to revalidate %s: %s', url, error)
+    finally:
+        with LOCK:
+            del REVALIDATIONS[path]
+
+
+def start_revalidation(path, url, ttl):
+    with LOCK:
+        if path in REVALIDATIONS:
+            return
+        thread = REVALIDATIONS[path] = threading.Thread(
+            target=revalidate, args=(path, url, ttl)
+        )
+    thread.daemon = True
+    thread.start()
+
+
+def get_response(kind, name):
+    """Returns content of GitHub API object, raises IOError on failure"""
+    url = '{0}{1}/{2}'.format(settings.GITHUB_API, kind, name)
+    if not settings.GITHUB_CACHE:
+        return fetch(url).content
+    ttl = TTL[kind]
+    path = get_path(kind, name)
+    entry = read_entry(path)
+    if entry is None:
+        entry = single_flight(path, lambda: update(path, url, ttl))
+    elif not entry.is_fresh(ttl):
+        start_revalidation(path, url, ttl)
+    return entry.content
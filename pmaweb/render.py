@@ -0,0 +1,189 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Static rendering of the website"""
+import os
+import shutil
+
+from django.core.urlresolvers import reverse, RegexURLPattern
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from files.catalog import get_catalog
+from news.models import Post
+from security.models import PMASA
+from pmaweb.output import write_file, COMPRESSED
+from pmaweb.sitemaps import SITEMAPS
+
+# Machine readable outputs listing releases
+RELEASE_FILES = [
+    '/{0}{1}.{2}'.format(prefix, name, ext)
+    for prefix in ('', 'home_page/')
+    for name in ('latest', 'version')
+    for ext in ('php', 'txt')
+] + [
+    '/version.js',
+    '/home_page/version.js',
+    '/version.json',
+    '/home_page/version.json',
+    '/downloads/list.txt',
+    '/packages.json',
+    '/p2/phpmyadmin/phpmyadmin.json',
+    '/p2/phpmyadmin/phpmyadmin~dev.json',
+]
+
+# Machine readable outputs without URL name
+FILES = RELEASE_FILES + [
+    '/robots.txt',
+]
+
+# Index file extensions for URLs ending with slash
+EXTENSIONS = {
+    'text/html': '.html',
+    'application/rss+xml': '.xml',
+    'application/xml': '.xml',
+    'application/json': '.json',
+    'application/javascript': '.js',
+    'text/plain': '.txt',
+}
+
+# Location of the error page
+NOT_FOUND = '404.html'
+
+
+def get_page_urls():
+    """Returns URLs of named patterns without parameters"""
+    # Imported here to avoid circular import through views
+    from pmaweb.urls import urlpatterns
+    return [
+        reverse(pattern.name)
+        for pattern in urlpatterns
+        if isinstance(pattern, RegexURLPattern) and
+        pattern.name and pattern.regex.groups == 0
+    ]
+
+
+def get_news_page_urls():
+    count = Post.objects.filter(date__lte=timezone.now()).count()
+    pages = max(1, (count + 9) // 10)
+    return [
+        reverse('news-page', kwargs={'page': page + 1})
+        for page in range(pages)
+    ]
+
+
+def get_sitemap_urls():
+    return [
+        reverse(
+            'django.contrib.sitemaps.views.sitemap',
+            kwargs={'section': section}
+        )
+        for section in sorted(SITEMAPS)
+    ]
+
+
+def get_site_urls():
+    """Returns all URLs of the public website"""
+    urls = get_page_urls() + FILES + get_news_page_urls() + get_sitemap_urls()
+    catalog = get_catalog()
+    urls.extend(catalog.get_archive_urls())
+    for branch in catalog.get_branch_names():
+        urls.extend(catalog.get_archive_urls(branch))
+    urls.extend([
+        release.get_absolute_url()
+        for release in catalog.listed
+    ])
+    urls.extend([
+        post.get_absolute_url()
+        for post in Post.objects.filter(date__lte=timezone.now())
+    ])
+    urls.extend([
+        pmasa.get_absolute_url()
+        for pmasa in PMASA.objects.filter(draft=False)
+    ])
+    result = []
+    for url in urls:
+        if url not in result:
+            result.append(url)
+    return result
+
+
+def url_to_path(url, content_type):
+    """Converts URL to relative filesystem path"""
+    path = url.lstrip('/')
+    if path == '' or path.endswith('/'):
+        mime = content_type.split(';')[0].strip()
+        path += 'index' + EXTENSIONS.get(mime, '.html')
+    return path
+
+
+class Renderer(object):
+    """Renders website URLs into a directory"""
+    def __init__(self, root, host):
+        self.root = root
+        self.client = Client(HTTP_HOST=host)
+
+    def render(self, url):
+        """Renders single URL, returns path of written file or None"""
+        with override_settings(DEBUG=False):
+            response = self.client.get(url)
+        if response.status_code != 200:
+            return None
+        path = url_to_path(url, response['Content-Type'])
+        write_file(os.path.join(self.root, path), response.content)
+        return path
+
+    def remove(self, url):
+        """Removes rendered files for no longer existing URL"""
+        paths = set(url_to_path(url, mime) for mime in EXTENSIONS)
+        for path in paths:
+            filename = os.path.join(self.root, path)
+            names = [filename] + [filename + suffix for suffix in COMPRESSED]
+            for name in names:
+                if os.path.exists(name):
+                    os.unlink(name)
+
+    def render_not_found(self):
+        with override_settings(DEBUG=False):
+            response = self.client.get('/{0}'.format(NOT_FOUND))
+        write_file(os.path.join(self.root, NOT_FOUND), response.content)
+        return NOT_FOUND
+
+
+def publish(build, target):
+    """Atomically replaces target with build directory
+
+    The target is a symbolic link pointing to the current build.
+    """
+    link = '{0}.link'.format(target)
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.basename(build), link)
+    previous = None
+    if os.path.islink(target):
+        previous = os.path.realpath(target)
+    elif os.path.exists(target):
+        previous = '{0}.old'.format(target)
+        os.rename(target, previous)
+    os.rename(link, target)
+    if previous and previous != os.path.realpath(build):
+        shutil.rmtree(previous)
@@ -0,0 +1,91 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Queue of pages to render statically"""
+import fcntl
+import os
+
+from django.conf import settings
+
+# Marker for rendering of all pages
+FULL_RENDER = '*'
+
+
+def enqueue_render(*urls):
+    """Adds URLs to the render queue"""
+    if not settings.RENDER_QUEUE or not urls:
+        return
+    data = ''.join('{0}\n'.format(url) for url in urls)
+    while True:
+        with open(settings.RENDER_QUEUE, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            # The queue might have been taken for processing meanwhile,
+            # writing there would lose the URLs once it is finished
+            if is_current(handle):
+                handle.write(data)
+                return
+
+
+def is_current(handle):
+    """Checks whether opened file is still the render queue"""
+    try:
+        current = os.stat(settings.RENDER_QUEUE)
+    except OSError:
+        return False
+    opened = os.fstat(handle.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+def get_processing_name():
+    return '{0}.processing'.format(settings.RENDER_QUEUE)
+
+
+def pop_render_queue():
+    """Takes queued URLs for processing
+
+    Call finish_render_queue once they are rendered, otherwise they will
+    be processed again on next run.
+    """
+    if not settings.RENDER_QUEUE:
+        return []
+    processing = get_processing_name()
+    if not os.path.exists(processing):
+        try:
+            os.rename(settings.RENDER_QUEUE, processing)
+        except OSError:
+            return []
+    with open(processing, 'r') as handle:
+        # Wait for writers which opened the queue before rename
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        urls = handle.read().split()
+    result = []
+    for url in urls:
+        if url not in result:
+            result.append(url)
+    return result
+
+
+def finish_render_queue():
+    if not settings.RENDER_QUEUE:
+        return
+    processing = get_processing_name()
+    if os.path.exists(processing):
+        os.unlink(processing)
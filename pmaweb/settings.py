@@ -31,6 +31,7 @@ https://docs.djangoproject.com/en/1.7/ref/settings/
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
+import tempfile
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 ADMINS = (
@@ -76,6 +77,9 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'pmaweb.middleware.QueryCountMiddleware',
+    'pmaweb.conditional.ConditionalMiddleware',
+    'pmaweb.dependencies.DependencyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -122,6 +126,24 @@ DATABASES = {
     }
 }
 
+# Cache holding the content generations, it has to be shared by all web
+# server processes and management commands so that they see the changes,
+# use memcached when these run on several hosts
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(
+            tempfile.gettempdir(), 'pmaweb-generations'
+        ),
+    }
+}
+
+# Tests use own cache directory
+TEST_RUNNER = 'pmaweb.testrunner.TestRunner'
+
+# Record per route query statistics also without DEBUG
+QUERY_STATS = False
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
 
@@ -151,6 +173,24 @@ STATICFILES_FINDERS = (
 # Location of download files
 FILES_PATH = os.path.join(BASE_DIR, 'frs')
 
+# File storing state of directories processed by import_files, unchanged
+# directories are skipped on next run, None disables it
+IMPORT_MANIFEST = None
+
+# Lock file preventing concurrent imports
+IMPORT_LOCK = os.path.join(tempfile.gettempdir(), 'pmaweb-import.lock')
+
+# Location and host name for static rendering of the website
+RENDER_PATH = os.path.join(BASE_DIR, 'rendered')
+RENDER_HOST = 'www.phpmyadmin.net'
+
+# File collecting pages to render incrementally, None disables it
+RENDER_QUEUE = None
+
+# Directory where machine readable files are published on release changes,
+# None disables publishing
+ARTIFACTS_PATH = None
+
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 # Enable offline javascript/css compression
@@ -164,12 +204,36 @@ COMPRESS_CSS_FILTERS = [
 # List of major versions to offer for download
 LISTED_BRANCHES = ('4.9','5.0')
 
+CDN_API_URL = 'https://api.cdn77.com/v2.0'
 CDN_LOGIN = 'admins@phpmyadmin.net'
 CDN_PASSWORD = ''
 CDN_ID = '41205'
 FILES_CDN_ID = '40483'
 
 DOCKERHUB_TOKEN = None
+DOCKERHUB_TRIGGER = \
+    'https://registry.hub.docker.com/u/phpmyadmin/phpmyadmin/trigger/{0}/'
+
+# Timeout in seconds and maximal number of connections per host for
+# outbound HTTP requests
+HTTP_TIMEOUT = 10
+HTTP_MAX_CONNECTIONS = 4
+
+# SQLite database queueing CDN purges and Docker Hub triggers for the
+# process_jobs command, None performs them immediately
+JOB_QUEUE = None
+
+# Include download boxes into pages using ESI, so that they do not have to
+# be purged from the CDN on new release
+EDGE_INCLUDES = False
 
 GITHUB_USER = 'phpmyadmin-bot'
 GITHUB_TOKEN = None
+
+GITHUB_API = 'https://api.github.com/repos/phpmyadmin/phpmyadmin/git/'
+
+# Concurrent upstream connections per host of the API proxy
+API_PROXY_CONNECTIONS = 16
+
+# Directory caching GitHub API responses, None disables the cache
+GITHUB_CACHE = None
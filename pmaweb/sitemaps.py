@@ -25,6 +25,7 @@ from django.utils import timezone
 from news.models import Post
 from security.models import PMASA
 from files.models import Release
+from pmaweb.dependencies import record, ALL
 
 
 class PagesSitemap(Sitemap):
@@ -101,6 +102,7 @@ class ReleasesSitemap(Sitemap):
     changefreq = 'monthly'
 
     def items(self):
+        record(ALL)
         return Release.objects.filter(snapshot=False)
 
     def lastmod(self, item):
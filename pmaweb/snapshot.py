@@ -0,0 +1,144 @@
+# -*- coding: UTF-8 -*-
+# vim: set expandtab sw=4 ts=4 sts=4:
+#
+# phpMyAdmin web site
+#
+# Copyright (C) 2008 - 2016 Michal Cihar <michal@cihar.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+"""Process wide snapshots of catalog data"""
+from functools import partial
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from pmaweb.dependencies import record
+
+GENERATION_KEY = 'pmaweb-catalog-generation'
+
+# Generation of releases and downloads only
+RELEASES_GENERATION = 'pmaweb-releases-generation'
+
+# Generations of other content with own feeds
+NEWS_GENERATION = 'pmaweb-news-generation'
+SECURITY_GENERATION = 'pmaweb-security-generation'
+
+
+def new_generation(previous=None):
+    """Returns generation as time of the change and unique token
+
+    The time is in whole seconds as used by HTTP and always increases, so
+    that it identifies the generation in Last-Modified headers.
+    """
+    changed = int(time.time())
+    if previous is not None and previous[0] >= changed:
+        changed = previous[0] + 1
+    return (changed, uuid.uuid4().hex)
+
+
+def get_generation(key=GENERATION_KEY):
+    """Returns current catalog generation
+
+    The generations are stored in the Django cache, which is shared with
+    other processes, so changes done by any of them are noticed.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        # Either first use or evicted from the cache, start new generation
+        cache.add(key, new_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key=GENERATION_KEY):
+    cache.set(key, new_generation(cache.get(key)), None)
+
+
+def invalidate(*keys):
+    """Marks snapshots as outdated
+
+    The catalog generation is always bumped, keys can list additional
+    generations to bump.
+
+    The generation is bumped immediately for current process and once more
+    after commit so that other processes can not cache data which were
+    read before the transaction was committed.
+    """
+    for key in (GENERATION_KEY,) + keys:
+        bump_generation(key)
+        transaction.on_commit(partial(bump_generation, key))
+
+
+class Snapshot(object):
+    """Data shared by all requests, rebuilt when the catalog changes
+
+    Every value is computed by its builder only once it is requested. The
+    optional expires callable returns time when the values become outdated
+    on their own. The key selects generation the snapshot depends on. The
+    optional tags map names to tags recorded as dependencies of pages using
+    the values.
+    """
+    def __init__(self, builders, expires=None, key=GENERATION_KEY,
+                 tags=None):
+        self.builders = builders
+        self.expires = expires
+        self.key = key
+        self.tags = tags or {}
+        self.lock = threading.RLock()
+        self.state = None
+
+    def is_valid(self, state, generation):
+        if state is None or state[0] != generation:
+            return False
+        return state[1] is None or state[1] > timezone.now()
+
+    def get_values(self):
+        generation = get_generation(self.key)
+        state = self.state
+        if not self.is_valid(state, generation):
+            with self.lock:
+                state = self.state
+                if not self.is_valid(state, generation):
+                    expires = self.expires() if self.expires else None
+                    state = self.state = (generation, expires, {})
+        return state[2]
+
+    def get(self, name):
+        if name in self.tags:
+            record(self.tags[name])
+        values = self.get_values()
+        if name not in values:
+            with self.lock:
+                if name not in values:
+                    values[name] = self.builders[name]()
+        return values[name]
+
+    def lazy(self, name):
+        """Returns callable which is evaluated by template on first use"""
+        result = []
+
+        def evaluate():
+            if not result:
+                result.append(self.get(name))
+            return result[0]
+        return evaluate
+
+    def context(self):
+        return {name: self.lazy(name) for name in self.builders}
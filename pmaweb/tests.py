@@ -21,18 +21,70 @@
 #
 
 from xml.etree import cElementTree as ElementTree
+import fcntl
+import gzip
+import os
+import shutil
+import json
+import logging
+import multiprocessing
+import sqlite3
+import tempfile
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from django.conf import settings
 from django.test import TestCase
-from django.core.urlresolvers import reverse
+from django.test.utils import CaptureQueriesContext
+from django.core.urlresolvers import reverse, RegexURLPattern
+from django.db import connection
+from django.utils import timezone
 from django.utils.timezone import utc, make_aware
 from urlparse import parse_qs
+from StringIO import StringIO
 import httpretty
 import datetime
+import httplib
+from pmaweb import context_processors
 from pmaweb.views import REDIRECT_MAP
-from pmaweb.cdn import URL as CDN_URL, URL_ALL as CDN_URL_ALL
+from pmaweb.urls import urlpatterns
+from pmaweb.middleware import get_query_stats, reset_query_stats
+from pmaweb.snapshot import (
+    Snapshot, bump_generation, invalidate, RELEASES_GENERATION,
+    NEWS_GENERATION, SECURITY_GENERATION
+)
+from pmaweb.render import Renderer, get_site_urls, publish
+from pmaweb.renderqueue import (
+    enqueue_render, finish_render_queue, get_processing_name,
+    pop_render_queue, FULL_RENDER
+)
+from pmaweb.fastpath import FastPathApplication, accepts_gzip
+from pmaweb.artifacts import publish_artifacts
+from django.core.management import call_command
+from pmaweb.cdn import (
+    purge_cdn, purge_files_cdn, purge_all_cdn, PURGE, PURGE_ALL, MAX_URLS
+)
+from pmaweb.dependencies import (
+    get_urls, store_dependencies, release_tag, KNOWN, LATEST, ALL
+)
+from pmaweb.dockerhub import dockerhub_trigger
+from pmaweb.proxycache import (
+    get_response, get_path, locked, read_entry, write_entry, Entry,
+    REVALIDATIONS
+)
+from pmaweb.apiproxy import ProxyServer, parse_response
+from pmaweb.jobs import process_jobs, BACKOFF
+from pmaweb.httpclient import (
+    get, post, close_pools, get_http_stats, reset_http_stats, HTTPError
+)
 from files.models import Release, Download, Theme
 from news.models import Post, Planet
 from security.models import PMASA
 
+CDN_URL = settings.CDN_API_URL + PURGE
+CDN_URL_ALL = settings.CDN_API_URL + PURGE_ALL
+
 
 class ViewTest(TestCase):
     fixtures = ['test_data.json']
@@ -63,6 +115,27 @@ class ViewTest(TestCase):
                 msg_prefix='Invalid response for {0}'.format(url),
             )
 
+    def test_context_snapshot(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'phpMyAdmin')
+        # Saving catalog data invalidates the snapshot
+        Planet.objects.create(
+            title='Snapshot test', url='https://example.net/snapshot/'
+        )
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Snapshot test')
+
+    def test_lazy_context(self):
+        # Plain text output does not need any site-wide context
+        with self.assertNumQueries(0):
+            response = self.client.get('/robots.txt')
+        self.assertContains(response, 'Sitemap')
+        response = self.client.get('/version.txt')
+        self.assertContains(response, '4.')
+        self.assertNotContains(response, 'phpMyAdmin news')
+
     def test_sitemaps(self):
         # Get root sitemap
         response = self.client.get('/sitemap.xml')
@@ -83,6 +156,444 @@ class ViewTest(TestCase):
             ElementTree.fromstring(response.content)
 
 
+# Maximal number of queries for named URLs with cold context snapshot
+QUERY_BUDGETS = {
+    'feed-news': 13,
+    'feed-files': 1,
+    'feed-security': 1,
+    'sitemap': 3,
+    'django.contrib.sitemaps.views.sitemap': 3,
+    'home': 6,
+    'news': 7,
+    'news-page': 7,
+    'news-item': 2,
+    'security': 3,
+    'security-issue': 4,
+    'security-issue-draft': 4,
+    'support': 1,
+    'docs': 1,
+    'try': 4,
+    'contribute': 1,
+    'contractor': 1,
+    'sponsors': 1,
+    'sponsors-subscribe': 1,
+    'themes': 3,
+    'license': 1,
+    'team': 1,
+    'translations': 3,
+    'awards': 1,
+    'about': 1,
+    '15-years': 1,
+    'donate': 1,
+    'about-website': 1,
+    'downloads': 1,
+    'translate': 1,
+    'develop': 1,
+    'contest': 1,
+    'files': 3,
+    'files-page': 3,
+    'files-branch': 3,
+    'files-branch-page': 3,
+    'release': 3,
+    'pad': 1,
+    'littleboxes': 1,
+    'doap': 1,
+    'latest-download': 1,
+}
+
+# Arguments for named URLs which need them
+URL_KWARGS = {
+    'django.contrib.sitemaps.views.sitemap': {'section': 'releases'},
+    'news-page': {'page': 1},
+    'security-issue': {'year': 2011, 'sequence': 1},
+    'security-issue-draft': {'year': 2011, 'sequence': 99},
+    'release': {'version': '4.4.10'},
+    'files-page': {'before': 402010099},
+    'files-branch': {'branch': '4.4'},
+    'files-branch-page': {'branch': '2.11', 'before': 211110199},
+    'latest-download': {'flavor': 'all-languages', 'extension': '.zip'},
+}
+
+# Statuses of named URLs which do not render a page
+URL_STATUS = {
+    'latest-download': 302,
+}
+
+
+class SnapshotTest(TestCase):
+    def test_other_process(self):
+        builds = []
+
+        def build():
+            builds.append(len(builds))
+            return len(builds)
+
+        key = 'pmaweb-test-generation'
+        snapshot = Snapshot({'value': build}, key=key)
+        self.assertEqual(snapshot.get('value'), 1)
+        self.assertEqual(snapshot.get('value'), 1)
+        # Change done by management command or other worker
+        process = multiprocessing.Process(target=bump_generation, args=(key,))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(snapshot.get('value'), 2)
+
+
+class QueryBudgetTest(TestCase):
+    fixtures = ['test_data.json']
+
+    def setUp(self):
+        PMASA.objects.create(year=2011, sequence=99, draft=True)
+
+    def get_url(self, name):
+        if name == 'news-item':
+            return Post.objects.all()[0].get_absolute_url()
+        return reverse(name, kwargs=URL_KWARGS.get(name))
+
+    def test_budgets(self):
+        names = set(
+            pattern.name for pattern in urlpatterns
+            if isinstance(pattern, RegexURLPattern) and pattern.name
+        )
+        for name in sorted(names):
+            self.assertIn(
+                name, QUERY_BUDGETS,
+                'Missing query budget for {0}'.format(name)
+            )
+            url = self.get_url(name)
+            # Measure with all snapshots cold
+            invalidate(
+                RELEASES_GENERATION, NEWS_GENERATION, SECURITY_GENERATION
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(
+                response.status_code,
+                URL_STATUS.get(name, 200),
+                '{0} ({1}) returned {2}'.format(
+                    name, url, response.status_code
+                )
+            )
+            self.assertLessEqual(
+                len(context),
+                QUERY_BUDGETS[name],
+                '{0} ({1}) made {2} queries, budget is {3}'.format(
+                    name, url, len(context), QUERY_BUDGETS[name]
+                )
+            )
+
+    def test_headers(self):
+        reset_query_stats()
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('files'))
+        self.assertIn('X-Query-Count', response)
+        self.assertIn('X-Query-Time', response)
+        self.assertIn('X-Query-Duplicates', response)
+        stats = get_query_stats()['files']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['queries'], int(response['X-Query-Count']))
+
+        # Statistics without headers
+        with self.settings(QUERY_STATS=True):
+            response = self.client.get(reverse('files'))
+        self.assertNotIn('X-Query-Count', response)
+        self.assertEqual(get_query_stats()['files']['requests'], 2)
+
+
+class ConditionalTest(TestCase):
+    fixtures = ['test_data.json']
+
+    def get(self, url, response=None):
+        headers = {}
+        if response is not None:
+            headers['HTTP_IF_NONE_MATCH'] = response['ETag']
+        return self.client.get(url, **headers)
+
+    def test_pages(self):
+        response = self.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        # Not modified is answered without touching the database
+        with self.assertNumQueries(0):
+            cached = self.get(reverse('home'), response)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        cached = self.client.get(
+            reverse('home'),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        Theme.objects.create(name='themeeee')
+        changed = self.get(reverse('home'), response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_feeds(self):
+        news = self.get(reverse('feed-news'))
+        files = self.get(reverse('feed-files'))
+        security = self.get(reverse('feed-security'))
+        Release.objects.create(version='4.9.0', release_notes='')
+        self.assertEqual(self.get(reverse('feed-news'), news).status_code, 304)
+        self.assertEqual(
+            self.get(reverse('feed-security'), security).status_code, 304
+        )
+        self.assertEqual(
+            self.get(reverse('feed-files'), files).status_code, 200
+        )
+        PMASA.objects.create(year=2000, sequence=99, draft=False)
+        self.assertEqual(
+            self.get(reverse('feed-security'), security).status_code, 200
+        )
+
+    def test_year(self):
+        response = self.get(reverse('home'))
+        original = context_processors.get_current_year
+        year = original() + 1
+        context_processors.get_current_year = lambda: year
+        try:
+            changed = self.get(reverse('home'), response)
+        finally:
+            context_processors.get_current_year = original
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertContains(changed, '2003 - {0}'.format(year))
+
+    def test_scheduled(self):
+        Post.objects.filter(pk=Post.objects.all()[0].pk).update(
+            date=timezone.now() + datetime.timedelta(seconds=1)
+        )
+        invalidate(NEWS_GENERATION)
+        response = self.get(reverse('feed-news'))
+        # Scheduled post shows up without saving it
+        time.sleep(1.1)
+        self.assertEqual(
+            self.get(reverse('feed-news'), response).status_code, 200
+        )
+
+
+class RenderTest(TestCase):
+    fixtures = ['test_data.json']
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tempdir, 'site')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_urls(self):
+        urls = get_site_urls()
+        for url in ('/', '/news/', '/news/feed/', '/robots.txt',
+                    '/files/4.4.10/', '/security/PMASA-2011-1/',
+                    '/news/2/', '/sitemap-releases.xml'):
+            self.assertIn(url, urls)
+        self.assertEqual(len(urls), len(set(urls)))
+
+    def test_render(self):
+        for number in range(2):
+            build = '{0}.{1}'.format(self.target, number)
+            renderer = Renderer(build, 'www.phpmyadmin.net')
+            self.assertEqual(renderer.render('/'), 'index.html')
+            self.assertEqual(
+                renderer.render('/news/feed/'), 'news/feed/index.xml'
+            )
+            self.assertEqual(renderer.render('/robots.txt'), 'robots.txt')
+            self.assertIsNone(
+                renderer.render('/downloads/phpMyAdmin-latest-english.zip')
+            )
+            renderer.render_not_found()
+            publish(build, self.target)
+            self.assertTrue(os.path.islink(self.target))
+
+        # Only latest build is kept
+        self.assertEqual(
+            sorted(os.listdir(self.tempdir)), ['site', 'site.1']
+        )
+        filename = os.path.join(self.target, 'robots.txt')
+        with open(filename, 'rb') as handle:
+            content = handle.read()
+        self.assertIn('Sitemap', content)
+        handle = gzip.open('{0}.gz'.format(filename))
+        self.assertEqual(handle.read(), content)
+        handle.close()
+        with open(os.path.join(self.target, '404.html'), 'rb') as handle:
+            self.assertIn('Page Not Found', handle.read())
+
+    def test_pending(self):
+        queue = os.path.join(self.tempdir, 'queue')
+        build = '{0}.initial'.format(self.target)
+        renderer = Renderer(build, 'www.phpmyadmin.net')
+        renderer.render('/')
+        renderer.render('/security/')
+        publish(build, self.target)
+        security = os.path.join(self.target, 'security', 'index.html')
+        os.unlink(security)
+
+        with self.settings(RENDER_QUEUE=queue):
+            PMASA.objects.create(year=2000, sequence=99, draft=False)
+            call_command(
+                'render_site', output=self.target, pending=True,
+                stdout=StringIO(),
+            )
+            # Queue is consumed
+            self.assertEqual(pop_render_queue(), [])
+
+        # Only affected pages were rendered into current build
+        self.assertEqual(os.path.realpath(self.target), build)
+        self.assertTrue(os.path.exists(security))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.target, 'security', 'PMASA-2000-99', 'index.html.gz'
+        )))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.target, 'files')
+        ))
+
+    def test_queue_race(self):
+        queue = os.path.join(self.tempdir, 'queue')
+        with self.settings(RENDER_QUEUE=queue):
+            enqueue_render('/')
+            with open(queue, 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                # Writer opens the queue before it is taken for processing
+                thread = threading.Thread(
+                    target=enqueue_render, args=('/news/',)
+                )
+                thread.start()
+                time.sleep(0.2)
+                os.rename(queue, get_processing_name())
+            self.assertEqual(pop_render_queue(), ['/'])
+            thread.join()
+            finish_render_queue()
+            self.assertEqual(pop_render_queue(), ['/news/'])
+
+    def test_queue_release(self):
+        queue = os.path.join(self.tempdir, 'queue')
+        with self.settings(RENDER_QUEUE=queue):
+            Release.objects.create(version='0.1')
+            Theme.objects.create(name='themeeee')
+            urls = pop_render_queue()
+            finish_render_queue()
+            # Old release does not change pages with download boxes
+            self.assertNotIn(FULL_RENDER, urls)
+            self.assertIn('/files/0.1/', urls)
+            self.assertIn(reverse('downloads'), urls)
+            self.assertEqual(urls[-1], '/themes/')
+
+            # New latest release changes all pages
+            Release.objects.create(version='99.0')
+            self.assertEqual(pop_render_queue(), [FULL_RENDER])
+            finish_render_queue()
+
+            # Unless the boxes are included from the fragment
+            with self.settings(EDGE_INCLUDES=True):
+                Release.objects.create(version='99.1')
+            urls = pop_render_queue()
+            finish_render_queue()
+            self.assertNotIn(FULL_RENDER, urls)
+            self.assertIn(reverse('littleboxes'), urls)
+            self.assertIn('/files/99.1/', urls)
+
+    def test_artifacts(self):
+        published = publish_artifacts(self.target)
+        self.assertIn('packages.json', published)
+        for path in published:
+            response = self.client.get('/' + path)
+            with open(os.path.join(self.target, path), 'rb') as handle:
+                self.assertEqual(handle.read(), response.content)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.target, 'downloads', 'list.txt.gz')
+        ))
+        # Unchanged files are not written again
+        self.assertEqual(publish_artifacts(self.target), [])
+        Release.objects.create(version='4.9.0', release_notes='')
+        published = publish_artifacts(self.target)
+        self.assertIn('version.txt', published)
+        with open(os.path.join(self.target, 'version.txt'), 'rb') as handle:
+            self.assertTrue(handle.read().startswith('4.9.0\n'))
+
+
+class FastPathTest(TestCase):
+    fixtures = ['test_data.json']
+
+    def setUp(self):
+        self.application = FastPathApplication(self.fallback, interval=0)
+
+    def fallback(self, environ, start_response):
+        start_response('200 OK', [])
+        return ['fallback']
+
+    def request(self, path, method='GET', **headers):
+        result = {}
+
+        def start_response(status, headers):
+            result['status'] = status
+            result['headers'] = dict(headers)
+
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+        environ.update(headers)
+        body = b''.join(self.application(environ, start_response))
+        return result['status'], result['headers'], body
+
+    def test_responses(self):
+        for path in ('/version.json', '/home_page/version.js', '/latest.php'):
+            status, headers, body = self.request(path)
+            self.assertEqual(status, '200 OK')
+            response = self.client.get(path)
+            self.assertEqual(body, response.content)
+            self.assertEqual(headers['Content-Type'], response['Content-Type'])
+
+    def test_fallback(self):
+        self.assertEqual(self.request('/news/')[2], 'fallback')
+        self.assertEqual(self.request('/version.txt', 'POST')[2], 'fallback')
+
+    def test_conditional(self):
+        status, headers, body = self.request(
+            '/version.txt', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        content = gzip.GzipFile(fileobj=StringIO(body)).read()
+        self.assertTrue(content.startswith('4.4.10\n'))
+        status, headers, body = self.request(
+            '/version.txt',
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=headers['ETag'],
+        )
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+        status, headers, body = self.request('/version.txt', 'HEAD')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, b'')
+
+    def test_accepts_gzip(self):
+        for header, expected in (
+                ('gzip, deflate', True),
+                ('deflate, GZIP;q=0.5', True),
+                ('gzip;q=0', False),
+                ('gzip; q=0.0, *', False),
+                ('gzip;q=invalid', False),
+                ('*', True),
+                ('*;q=0', False),
+                ('identity', False),
+                ('', False)):
+            self.assertEqual(
+                accepts_gzip({'HTTP_ACCEPT_ENCODING': header}), expected,
+                header
+            )
+        headers = self.request(
+            '/version.txt', HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )[1]
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_rebuild(self):
+        etag = self.request('/version.txt')[1]['ETag']
+        Release.objects.create(version='4.9.0', release_notes='')
+        status, headers, body = self.request('/version.txt')
+        self.assertNotEqual(headers['ETag'], etag)
+        self.assertTrue(body.startswith('4.9.0\n'))
+
+
 class CDNTest(TestCase):
     trigger_urls = []
 
@@ -179,3 +690,519 @@ class CDNTest(TestCase):
                 datetime.datetime(year=2000, month=1, day=1), utc
             ),
         )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Records requests, replies with queued or successful responses"""
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, response, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(response)
+
+    def do_GET(self):
+        self.server.requests.append(
+            (self.path, self.headers.get('If-None-Match'))
+        )
+        self.server.headers.append(self.headers)
+        time.sleep(self.server.delay)
+        if self.path.endswith('/missing'):
+            self.reply(404, '{"message":"Not Found"}')
+        elif self.path.endswith('/truncated'):
+            self.send_response(200)
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            self.wfile.write('{"sha":')
+            self.close_connection = 1
+        elif self.path.startswith('/git/'):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.reply(304, '')
+            else:
+                self.reply(200, '{"sha":"v1"}', [('ETag', '"v1"')])
+        elif self.path == '/redirect':
+            self.reply(302, '', [('Location', '/target')])
+        elif self.path == '/redirect-host':
+            location = 'http://localhost:{0}/target'.format(
+                self.server.server_port
+            )
+            self.reply(302, '', [('Location', location)])
+        else:
+            self.reply(200, '{"path":"%s"}' % self.path)
+            if self.path == '/drop':
+                # Close the connection without telling the client
+                self.close_connection = 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, body))
+        response = '{"status":"ok"}'
+        if self.server.responses:
+            response = self.server.responses.pop(0)
+        self.reply(200, response)
+
+    def log_message(self, *args):
+        return
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on slow responses are expected
+        return
+
+
+class StandInMixin(object):
+    def start_server(self):
+        self.server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        self.server.requests = []
+        self.server.headers = []
+        self.server.responses = []
+        self.server.delay = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return 'http://127.0.0.1:{0}'.format(self.server.server_port)
+
+    def stop_server(self):
+        close_pools()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HTTPClientTest(StandInMixin, TestCase):
+    def setUp(self):
+        self.base = self.start_server()
+        self.host = self.base.split('/')[-1]
+        reset_http_stats()
+
+    def tearDown(self):
+        self.stop_server()
+
+    def test_keepalive(self):
+        for path in ('/a', '/b', '/c'):
+            self.assertEqual(get(self.base + path).json(), {'path': path})
+        stats = get_http_stats()[self.host]
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['connections'], 1)
+
+    def test_stale(self):
+        get(self.base + '/drop')
+        self.assertEqual(get(self.base + '/a').json(), {'path': '/a'})
+        stats = get_http_stats()[self.host]
+        self.assertEqual(stats['errors'], 0)
+        # Retried on new connection
+        self.assertEqual(stats['connections'], 2)
+
+    def test_redirect(self):
+        self.assertEqual(
+            get(self.base + '/redirect').json(), {'path': '/target'}
+        )
+
+    def test_redirect_host(self):
+        response = get(
+            self.base + '/redirect-host',
+            headers={'Authorization': 'Basic secret'}
+        )
+        self.assertEqual(response.json(), {'path': '/target'})
+        self.assertEqual(
+            [headers.get('Authorization') for headers in self.server.headers],
+            ['Basic secret', None]
+        )
+
+    def test_stale_post(self):
+        get(self.base + '/drop')
+        # The request might have been performed, so it is not repeated
+        with self.assertRaises(IOError):
+            post(self.base + '/a', {'a': 'b'})
+        self.assertEqual(get_http_stats()[self.host]['errors'], 1)
+
+    def test_error(self):
+        with self.assertRaises(HTTPError) as context:
+            get(self.base + '/missing')
+        self.assertEqual(context.exception.code, 404)
+        self.assertEqual(context.exception.content, '{"message":"Not Found"}')
+        with self.assertRaises(IOError):
+            get('http://127.0.0.1:1/')
+        self.assertEqual(get_http_stats()['127.0.0.1:1']['errors'], 1)
+
+
+class ProxyCacheTest(StandInMixin, TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.override = self.settings(
+            GITHUB_API=self.start_server() + '/git/',
+            GITHUB_CACHE=self.tempdir,
+        )
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.stop_server()
+        shutil.rmtree(self.tempdir)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, '{"sha":"v1"}')
+
+    def test_commit(self):
+        url = '/api/commit/{0}/'.format('a' * 40)
+        self.get(url)
+        self.get(url)
+        self.assertEqual(
+            self.server.requests, [('/git/commits/' + 'a' * 40, None)]
+        )
+
+    def test_tree(self):
+        self.get('/api/tree/master/')
+        path = get_path('trees', 'master')
+        entry = read_entry(path)
+        entry.fetched -= 3600
+        write_entry(path, entry)
+        # Stale response is served while it is revalidated
+        self.get('/api/tree/master/')
+        for thread in list(REVALIDATIONS.values()):
+            thread.join()
+        self.assertEqual(
+            self.server.requests,
+            [('/git/trees/master', None), ('/git/trees/master', '"v1"')]
+        )
+        self.assertGreater(read_entry(path).fetched, time.time() - 60)
+
+    def test_single_flight(self):
+        self.server.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    get_response('commits', 'b' * 40)
+                )
+            )
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['{"sha":"v1"}'] * 5)
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class RecordingHandler(logging.Handler):
+    """Collects log messages"""
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class LogMixin(object):
+    def start_logging(self, name):
+        self.logger = logging.getLogger(name)
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+
+    def stop_logging(self):
+        self.logger.removeHandler(self.handler)
+
+
+class APIProxyTest(LogMixin, StandInMixin, TestCase):
+    def setUp(self):
+        self.start_logging('pmaweb.apiproxy')
+        self.tempdir = tempfile.mkdtemp()
+        self.override = self.settings(
+            GITHUB_API=self.start_server() + '/git/',
+            GITHUB_CACHE=self.tempdir,
+            API_PROXY_CONNECTIONS=2,
+            HTTP_TIMEOUT=1,
+        )
+        self.override.enable()
+        self.proxy = ProxyServer(('127.0.0.1', 0))
+        self.port = self.proxy.socket.getsockname()[1]
+        self.thread = threading.Thread(
+            target=self.proxy.serve_forever, args=(0.05,)
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.proxy.shutdown()
+        self.thread.join()
+        self.override.disable()
+        self.stop_server()
+        shutil.rmtree(self.tempdir)
+        self.stop_logging()
+
+    def get(self, path):
+        connection = httplib.HTTPConnection('127.0.0.1', self.port)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        result = (response.status, response.read())
+        connection.close()
+        return result
+
+    def get_parallel(self, paths):
+        results = {}
+
+        def get(path):
+            results[path] = self.get(path)
+
+        threads = [threading.Thread(target=get, args=(path,))
+                   for path in paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_commit(self):
+        path = '/api/commit/{0}/'.format('a' * 40)
+        connection = httplib.HTTPConnection('127.0.0.1', self.port)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), '{"sha":"v1"}')
+        self.assertEqual(response.getheader('Cache-Control'), 'max-age=86400')
+        connection.close()
+        self.assertEqual(self.get(path), (200, '{"sha":"v1"}'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_not_found(self):
+        self.assertEqual(
+            self.get('/api/tree/missing/'), (404, '{"message":"Not Found"}')
+        )
+        self.assertEqual(self.get('/api/other/')[0], 404)
+
+    def test_stale(self):
+        self.get('/api/tree/master/')
+        path = get_path('trees', 'master')
+        entry = read_entry(path)
+        entry.fetched -= 3600
+        write_entry(path, entry)
+        self.assertEqual(self.get('/api/tree/master/'), (200, '{"sha":"v1"}'))
+        for dummy in range(100):
+            if len(self.server.requests) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(
+            self.server.requests[1], ('/git/trees/master', '"v1"')
+        )
+
+    def test_concurrent(self):
+        self.server.delay = 0.3
+        start = time.time()
+        paths = ['/api/tree/{0}/'.format(name) for name in 'abc']
+        results = self.get_parallel(paths + paths[:1] * 3)
+        # Same trees share request, at most two run at the same time
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertGreaterEqual(time.time() - start, 0.6)
+        for path in paths:
+            self.assertEqual(results[path], (200, '{"sha":"v1"}'))
+
+    def test_timeout(self):
+        self.server.delay = 2
+        self.assertEqual(self.get('/api/tree/slow/')[0], 504)
+        self.assertEqual(
+            self.handler.messages,
+            ['GitHub API request failed: Upstream request timed out']
+        )
+
+    def test_truncated(self):
+        status, content = self.get('/api/tree/truncated/')
+        self.assertEqual(status, 502)
+        self.assertIn('Truncated response', content)
+        self.assertIsNone(read_entry(get_path('trees', 'truncated')))
+
+    def test_parse_response(self):
+        self.assertEqual(
+            parse_response(
+                'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                '3\r\n{"a\r\n4\r\n":1}\r\n0\r\n\r\n'
+            ),
+            (200, {'transfer-encoding': 'chunked'}, '{"a":1}')
+        )
+        with self.assertRaises(ValueError):
+            parse_response(
+                'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                '3\r\n{"a\r\n'
+            )
+
+    def test_lock(self):
+        path = get_path('trees', 'master')
+        results = []
+        with locked(path):
+            # Other process is fetching the tree
+            thread = threading.Thread(
+                target=lambda: results.append(self.get('/api/tree/master/'))
+            )
+            thread.start()
+            time.sleep(0.2)
+            write_entry(path, Entry('{"sha":"v2"}', '"v2"', time.time()))
+        thread.join()
+        self.assertEqual(results, [(200, '{"sha":"v2"}')])
+        self.assertEqual(self.server.requests, [])
+
+
+class JobTest(LogMixin, StandInMixin, TestCase):
+    def setUp(self):
+        self.start_logging('pmaweb.jobs')
+        self.tempdir = tempfile.mkdtemp()
+        self.queue = os.path.join(self.tempdir, 'jobs.db')
+        base = self.start_server()
+        self.override = self.settings(
+            JOB_QUEUE=self.queue,
+            CDN_PASSWORD='x',
+            CDN_API_URL=base,
+            DOCKERHUB_TOKEN='token',
+            DOCKERHUB_TRIGGER=base + '/trigger/{0}/',
+        )
+        self.override.enable()
+        KNOWN.clear()
+
+    def tearDown(self):
+        self.override.disable()
+        self.stop_server()
+        shutil.rmtree(self.tempdir)
+        self.stop_logging()
+
+    def commit(self):
+        """Runs on commit callbacks, TestCase never commits"""
+        callbacks = connection.run_on_commit
+        connection.run_on_commit = []
+        for sids, func in callbacks:
+            func()
+
+    def get_purged(self):
+        result = []
+        for path, body in self.server.requests:
+            self.assertEqual(path, PURGE)
+            result.extend(parse_qs(body)['url[]'])
+        return result
+
+    def test_merge(self):
+        purge_cdn('/a/', '/b/')
+        purge_cdn('/b/', '/c/')
+        purge_files_cdn('/a/')
+        # Nothing is stored before commit
+        self.assertEqual(process_jobs(window=0), (0, 0))
+        self.commit()
+        # Waiting for more jobs
+        self.assertEqual(process_jobs(window=60), (0, 0))
+        self.assertEqual(process_jobs(window=0), (2, 0))
+        self.assertEqual(
+            sorted(self.get_purged()), ['/a/', '/a/', '/b/', '/c/']
+        )
+        self.assertEqual(process_jobs(window=0), (0, 0))
+
+    def test_purge_all(self):
+        # Purges are covered by purge of all pages
+        Theme.objects.create(name='themeeee')
+        purge_all_cdn()
+        self.commit()
+        self.assertEqual(process_jobs(window=0), (1, 0))
+        self.assertEqual(
+            [path for path, body in self.server.requests], [PURGE_ALL]
+        )
+
+    def test_release(self):
+        store_dependencies('/', [LATEST])
+        store_dependencies('/about/', [release_tag('1.1.0')])
+        store_dependencies('/files/', [ALL])
+        Release.objects.create(version='9.0', release_notes='')
+        self.commit()
+        self.assertEqual(process_jobs(window=0), (2, 0))
+        purged = self.get_purged()
+        self.assertIn('/files/9.0/', purged)
+        self.assertIn('/', purged)
+        self.assertIn('/files/', purged)
+        self.assertNotIn('/about/', purged)
+
+    def test_chunks(self):
+        pages = ['/{0}/'.format(i) for i in range(MAX_URLS + 10)]
+        purge_cdn(*pages)
+        purge_cdn(*pages)
+        self.commit()
+        self.assertEqual(process_jobs(window=0), (1, 0))
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.get_purged(), pages)
+
+    def test_retry(self):
+        self.server.responses.extend([
+            '{"status":"ok"}',
+            '{"status":"error","errors":["x"]}',
+        ])
+        dockerhub_trigger('4.9.1')
+        purge_cdn('/a/')
+        self.commit()
+        self.assertEqual(process_jobs(window=0), (1, 1))
+        self.assertEqual(
+            [path for path, body in self.server.requests],
+            ['/trigger/token/', PURGE]
+        )
+        self.assertEqual(
+            json.loads(self.server.requests[0][1]), {'docker_tag': '4.9.1'}
+        )
+        # Retried only after delay
+        del self.server.requests[:]
+        self.assertEqual(process_jobs(window=0), (0, 0))
+        handle = sqlite3.connect(self.queue)
+        with handle:
+            handle.execute('UPDATE job SET due = 0')
+        self.assertEqual(process_jobs(window=0), (1, 0))
+        self.assertEqual(self.get_purged(), ['/a/'])
+
+        # Given up after all retries
+        self.server.responses.append('{"status":"error"}')
+        purge_cdn('/b/')
+        self.commit()
+        with handle:
+            handle.execute('UPDATE job SET attempts = ?', (len(BACKOFF),))
+        self.assertEqual(process_jobs(window=0), (0, 1))
+        self.assertEqual(
+            handle.execute('SELECT value, due FROM job').fetchall(),
+            [(u'/b/', None)]
+        )
+        handle.close()
+
+
+class DependencyTest(TestCase):
+    fixtures = ['test_data.json']
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        KNOWN.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def get_urls(self, *tags):
+        with self.settings(JOB_QUEUE=os.path.join(self.tempdir, 'jobs.db')):
+            for url in ('/', '/about/', '/files/', '/files/4.4.10/'):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return get_urls(tags)
+
+    def test_dependencies(self):
+        self.assertEqual(
+            self.get_urls(LATEST),
+            ['/', '/about/', '/files/', '/files/4.4.10/']
+        )
+        self.assertEqual(self.get_urls(release_tag('1.1.0')), ['/about/'])
+        self.assertEqual(
+            self.get_urls(release_tag('4.4.10')), ['/files/4.4.10/']
+        )
+        self.assertEqual(self.get_urls(ALL), ['/files/'])
+
+    def test_edge_includes(self):
+        with self.settings(EDGE_INCLUDES=True):
+            response = self.client.get('/about/')
+            self.assertContains(response, '<esi:include src="/_littleboxes/"')
+            self.assertEqual(self.get_urls(LATEST), [])
+        response = self.client.get('/_littleboxes/')
+        self.assertContains(response, 'Download 4.4.10')
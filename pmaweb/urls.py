@@ -22,11 +22,13 @@
 from django.conf.urls import include, url
 from django.contrib import admin
 from django.views.generic import RedirectView
-from django.views.generic import TemplateView
-from pmaweb.views import PMAView, redirect_home_page, github_tree, github_commit
+from pmaweb.views import (
+    PMAView, PlainTemplateView, redirect_home_page, github_tree, github_commit
+)
 from security.views import PMASAView, PMASADraftView, redirect_security
 from files.views import (
-    ReleaseList, ReleaseDetail, version_json, latest_download
+    ReleaseList, ReleaseDetail, version_json, latest_download,
+    composer_packages, composer_metadata, composer_dev_metadata,
 )
 from news.views import PostArchive, PostDetail
 from news.feeds import NewsFeed
@@ -287,6 +289,21 @@ urlpatterns = [
         ReleaseList.as_view(),
         name='files'
     ),
+    url(
+        r'^files/before/(?P<before>[0-9]+)/$',
+        ReleaseList.as_view(),
+        name='files-page'
+    ),
+    url(
+        r'^files/(?P<branch>[0-9]+\.[0-9]+)/$',
+        ReleaseList.as_view(),
+        name='files-branch'
+    ),
+    url(
+        r'^files/(?P<branch>[0-9]+\.[0-9]+)/before/(?P<before>[0-9]+)/$',
+        ReleaseList.as_view(),
+        name='files-branch-page'
+    ),
     url(
         r'^files/(?P<version>[a-z0-9.-]*)/$',
         ReleaseDetail.as_view(),
@@ -314,26 +331,39 @@ urlpatterns = [
     # robots.txt
     url(
         r'^robots.txt$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='robots.txt',
             content_type='text/plain'
         )
     ),
 
+    # Download boxes included by the CDN
+    url(
+        r'^_littleboxes/$',
+        PlainTemplateView.as_view(
+            template_name='_littleboxes.html',
+            content_type='text/html',
+            context_groups=('releases',),
+        ),
+        name='littleboxes',
+    ),
+
     # Machine parsable output
     url(
         r'^home_page/phpmyadmin.xml$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='phpmyadmin.xml',
-            content_type='application/xml'
+            content_type='application/xml',
+            context_groups=('releases',),
         ),
         name='pad',
     ),
     url(
         r'^home_page/phpmyadmin-doap.xml$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='phpmyadmin-doap.xml',
-            content_type='application/xml'
+            content_type='application/xml',
+            context_groups=('releases',),
         ),
         name='doap',
     ),
@@ -341,16 +371,18 @@ urlpatterns = [
     # Version information
     url(
         r'^(home_page/)?(latest|version)\.(php|txt)$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='version/version.txt',
-            content_type='text/plain'
+            content_type='text/plain',
+            context_groups=('releases',),
         )
     ),
     url(
         r'^downloads/list\.txt$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='version/list.txt',
-            content_type='text/plain'
+            content_type='text/plain',
+            context_groups=('releases',),
         )
     ),
     url(
@@ -371,9 +403,10 @@ urlpatterns = [
     ),
     url(
         r'^(home_page/)?version\.js$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='version/version.js',
-            content_type='application/javascript'
+            content_type='application/javascript',
+            context_groups=('releases',),
         )
     ),
     url(
@@ -395,16 +428,21 @@ urlpatterns = [
     # Composer packages
     url(
         r'^packages\.json$',
-        TemplateView.as_view(
-            template_name='version/packages.json',
-            content_type='application/json'
-        )
+        composer_packages,
+    ),
+    url(
+        r'^p2/phpmyadmin/phpmyadmin\.json$',
+        composer_metadata,
+    ),
+    url(
+        r'^p2/phpmyadmin/phpmyadmin~dev\.json$',
+        composer_dev_metadata,
     ),
 
     # Test backend
     url(
         r'^test/data$',
-        TemplateView.as_view(
+        PlainTemplateView.as_view(
             template_name='test-data',
             content_type='text/plain'
         )
@@ -21,10 +21,6 @@
 #
 """Compatibility redirect handlers"""
 
-import urllib2
-import base64
-
-from django.conf import settings
 from django.shortcuts import redirect
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse, Http404, HttpResponseServerError
@@ -32,6 +28,9 @@ from django.views.decorators.cache import cache_control
 from django.views.generic import TemplateView
 from django.shortcuts import render
 
+from pmaweb.httpclient import HTTPError
+from pmaweb.proxycache import get_response
+
 # Aliases to redirect from old website URLs (/home_page/something.php)
 # to new ones (/something/):
 
@@ -72,8 +71,6 @@ REDIRECT_MAP = {
     'ownloads': 'downloads',
 }
 
-GITHUB_API = 'https://api.github.com/repos/phpmyadmin/phpmyadmin/git/'
-
 
 def redirect_home_page(request, page):
     """Redirect handled for old website links"""
@@ -92,23 +89,16 @@ def notfound(request):
     )
 
 
-def proxy_request(url):
+def proxy_request(kind, name):
     """Helper for proxying requests"""
     try:
-        request = urllib2.Request(url)
-        if settings.GITHUB_USER and settings.GITHUB_TOKEN:
-            base64string = base64.b64encode('%s:%s' % (settings.GITHUB_USER, settings.GITHUB_TOKEN))
-            request.add_header('Authorization', 'Basic %s' % base64string)
-        handle = urllib2.urlopen(request)
-        code = handle.getcode()
-        content = handle.read()
+        content = get_response(kind, name)
+    except HTTPError as err:
+        if err.code == 404:
+            raise Http404(err.content)
+        return HttpResponseServerError(err.content)
     except IOError as err:
-        content = str(err)
-        if hasattr(err, 'fp'):
-            content = err.fp.read()
-        if hasattr(err, 'code') and err.code == 404:
-            raise Http404(content)
-        return HttpResponseServerError(content)
+        return HttpResponseServerError(str(err))
     return HttpResponse(
         content,
         content_type='application/json',
@@ -118,13 +108,33 @@ def proxy_request(url):
 @cache_control(max_age=600)
 def github_tree(request, name):
     """Proxy for GitHub tree API"""
-    return proxy_request('{0}trees/{1}'.format(GITHUB_API, name))
+    return proxy_request('trees', name)
 
 
 @cache_control(max_age=86400)
 def github_commit(request, name):
     """Proxy for GitHub commit API"""
-    return proxy_request('{0}commits/{1}'.format(GITHUB_API, name))
+    return proxy_request('commits', name)
+
+
+class ContextGroupsMixin(object):
+    """Declares which groups of the site-wide context the view uses
+
+    The groups are basic, menu and releases, None means all of them.
+    """
+    context_groups = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.context_groups is not None:
+            request.context_groups = self.context_groups
+        return super(ContextGroupsMixin, self).dispatch(
+            request, *args, **kwargs
+        )
+
+
+class PlainTemplateView(ContextGroupsMixin, TemplateView):
+    """Template view for machine readable output"""
+    context_groups = ()
 
 
 class PMAView(TemplateView):
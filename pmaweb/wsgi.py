@@ -33,3 +33,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pmaweb.settings")
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+# Imported once Django is set up
+from pmaweb.fastpath import FastPathApplication  # noqa
+application = FastPathApplication(application)
@@ -29,6 +29,11 @@ class PMASAFeed(Feed):
     description = "Security announcements from the phpMyAdmin project."
     description_template = 'security/rss.html'
 
+    def __call__(self, request, *args, **kwargs):
+        # Item description template needs no site-wide context
+        request.context_groups = ()
+        return super(PMASAFeed, self).__call__(request, *args, **kwargs)
+
     def items(self):
         return PMASA.objects.filter(draft=False)[:10]
 
@@ -20,13 +20,15 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.core.urlresolvers import reverse
 from django.db import models
 from django.utils import timezone
 from markupfield.fields import MarkupField
 import datetime
 from pmaweb.cdn import purge_cdn
+from pmaweb.snapshot import invalidate, SECURITY_GENERATION
+from pmaweb.renderqueue import enqueue_render
 
 YEAR_TODAY = datetime.date.today().year
 YEAR_CHOICES = [(i, i) for i in range(2003, YEAR_TODAY + 1)]
@@ -129,8 +131,20 @@ class PMASA(models.Model):
 
 @receiver(post_save, sender=PMASA)
 def purge_pmasa(sender, instance, **kwargs):
-    purge_cdn(
+    invalidate(SECURITY_GENERATION)
+    pages = [
         reverse('security'),
         reverse('feed-security'),
+        reverse(
+            'django.contrib.sitemaps.views.sitemap',
+            kwargs={'section': 'security'}
+        ),
         instance.get_absolute_url(),
-    )
+    ]
+    purge_cdn(*pages)
+    enqueue_render(*pages)
+
+
+@receiver(post_delete, sender=PMASA)
+def delete_pmasa(sender, instance, **kwargs):
+    invalidate(SECURITY_GENERATION)
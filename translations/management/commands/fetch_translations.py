@@ -20,10 +20,11 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
 from translations.models import Translation
-import json
+from pmaweb.httpclient import get
+from pmaweb.renderqueue import enqueue_render
 from dateutil import parser
-import urllib
 
 URL = 'https://hosted.weblate.org/exports/stats/phpmyadmin/master/'
 
@@ -32,11 +33,9 @@ class Command(BaseCommand):
     help = 'Downloads translation stats'
 
     def handle(self, *args, **options):
-        handle = urllib.urlopen(URL)
-        data = handle.read()
         try:
-            content = json.loads(data)
-        except ValueError:
+            content = get(URL).json()
+        except (IOError, ValueError):
             print("There was a problem parsing the data from Hosted Weblate.")
             print("Check the status of the feed page: " + URL)
             import sys
@@ -64,3 +63,5 @@ class Command(BaseCommand):
                         modified = True
                     if modified:
                         translation.save()
+
+        enqueue_render(reverse('translations'))
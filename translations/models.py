@@ -19,7 +19,10 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 from django.db import models
+from pmaweb.snapshot import invalidate
 
 
 class Translation(models.Model):
@@ -45,3 +48,9 @@ class Translation(models.Model):
         elif self.percent < 80:
             return 'progress-bar-warning'
         return 'progress-bar-success'
+
+
+@receiver(post_save, sender=Translation)
+@receiver(post_delete, sender=Translation)
+def update_translation(sender, instance, **kwargs):
+    invalidate()